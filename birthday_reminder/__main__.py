@@ -1,6 +1,9 @@
+import multiprocessing
 from sys import exit
 
 from birthday_reminder.app import main
 
 if __name__ == "__main__":
+    # workers of parse_workers > 1 are spawned processes, in frozen builds they run this file again
+    multiprocessing.freeze_support()
     exit(main())
@@ -1,24 +1,32 @@
 import argparse
 import copy
 import traceback
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
 
 from birthday_reminder.birthday_event import BirthdayEvent, ComparisonResult, compare_events_file_and_google
 from birthday_reminder.configs.base_config import add_arguments_to_parser
 from birthday_reminder.configs.main_config import MAIN_CONFIG_FILE, MainConfig
 from birthday_reminder.drivers.file_reader import FileReader
-from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+from birthday_reminder.drivers.upload_journal import UploadCheckpoint, UploadJournal
+from birthday_reminder.event_store import EventStore
+from birthday_reminder.utils.birthday_calendar import reference_time
 from birthday_reminder.utils.colorize import Colorize
+from birthday_reminder.utils.json_file import save_json
 
+if TYPE_CHECKING:
+    from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
 
-def print_events(events: list[BirthdayEvent]):
+
+def print_events(events: Sequence[BirthdayEvent]):
+    stats = BirthdayEvent.birthday_stats(events)
     chars_for_digit = len(str(len(events)))
     for idx, event in enumerate(events):
-        print(f"{(idx + 1):{chars_for_digit}}. {event}")
+        event_str = event.display_str(stats.ages[idx], stats.days_until_next_birthday[idx])
+        print(f"{(idx + 1):{chars_for_digit}}. {event_str}")
     print()
 
 
-def show(events: list[BirthdayEvent], sort_type: BirthdayEvent.SortTypes):
+def show(events: Iterable[BirthdayEvent], sort_type: BirthdayEvent.SortTypes):
     messages = {
         BirthdayEvent.SortTypes.year: "year of birth",
         BirthdayEvent.SortTypes.date: "month and day of birth",
@@ -27,12 +35,31 @@ def show(events: list[BirthdayEvent], sort_type: BirthdayEvent.SortTypes):
     message = Colorize.info(f"\nShowing birthdays sorted by {messages[sort_type]}:\n")
     print(message)
 
-    events_sorted = BirthdayEvent.sort_events(events, sort_type)
+    keys = events.sort_keys(sort_type) if isinstance(events, EventStore) else None
+    events_sorted = BirthdayEvent.sort_events(events, sort_type, keys)
     print_events(events_sorted)
 
 
+def non_negative_int(value: str) -> int:
+    """argparse type for numbers that must be at least 0"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {value}")
+    return number
+
+
+def upcoming(events: EventStore, n_days: int):
+    matches = events.upcoming(n_days)
+    period = "today" if n_days == 0 else f"in the next {n_days} days"
+    if not matches:
+        print(Colorize.info(f"\nNo birthdays {period}\n"))
+        return
+    print(Colorize.info(f"\nBirthdays {period}:\n"))
+    print_events([event for _, event in matches])
+
+
 def print_diff(
-    file_events: list[BirthdayEvent], google_events: list[BirthdayEvent], r: ComparisonResult, config: MainConfig
+    file_events: Sequence[BirthdayEvent], google_events: list[BirthdayEvent], r: ComparisonResult, config: MainConfig
 ):
     print(
         Colorize.info(
@@ -57,6 +84,44 @@ def print_diff(
         print_events(list(r.google_only_events))
 
 
+def create_google_calendar_api(config: MainConfig) -> "GoogleCalendarApi":
+    if config.use_async_driver:
+        from birthday_reminder.drivers.google_calendar_async_api import AsyncGoogleCalendarApi
+
+        return AsyncGoogleCalendarApi(config)
+
+    from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+
+    return GoogleCalendarApi(config)
+
+
+def print_plan(checkpoint: UploadCheckpoint, estimate: dict, config: MainConfig):
+    counts = checkpoint.operation_counts
+    print(
+        Colorize.info(
+            f"{counts['DELETE']} events will be deleted, {counts['PATCH']} updated, {counts['CREATE']} created: "
+            f"{estimate['api_calls']} API calls (counted towards quota) in {estimate['http_requests']} HTTP requests, "
+            f"about {estimate['seconds']} seconds at {config.qps} calls per second"
+        )
+    )
+
+
+def run_upload(args, gc_api: "GoogleCalendarApi", journal: UploadJournal, checkpoint: UploadCheckpoint) -> bool:
+    """Sends planned requests and saves the journal. On failure the checkpoint is kept for 'upload --resume'"""
+    try:
+        journal.invalidate()
+        checkpoint.run(gc_api)
+        journal.record_entries(checkpoint.journal_entries)
+        checkpoint.remove()
+    except Exception as e:
+        print_error(args, e)
+        print(Colorize.warning("Upload is interrupted. Use 'upload --resume' to continue from where it stopped"))
+        return False
+    print(Colorize.success("Events uploaded successfully!"))
+    print(Colorize.info(f"Event data sent: {gc_api.bytes_sent} bytes"))
+    return True
+
+
 def print_error(args, e: Exception):
     print(Colorize.fail(str(e)))
     if args.verbose >= 3:
@@ -64,6 +129,12 @@ def print_error(args, e: Exception):
 
 
 def main(cmdline_args: Optional[list] = None) -> int:
+    # the whole run uses one "now": ages and days until birthdays don't change if it crosses midnight
+    with reference_time():
+        return _main(cmdline_args)
+
+
+def _main(cmdline_args: Optional[list]) -> int:
     config = MainConfig()
 
     parser = argparse.ArgumentParser(prog="birthday-reminder", description="Birthday Reminder")
@@ -72,21 +143,61 @@ def main(cmdline_args: Optional[list] = None) -> int:
     validate_parser = subparsers.add_parser("validate", description="Just read file and check for errors")
     show_parser = subparsers.add_parser("show", description="Show birthdays from file")
     gshow_parser = subparsers.add_parser("gshow", description="Show birthdays from Google Calendar")
+    upcoming_parser = subparsers.add_parser("upcoming", description="Show birthdays in the next few days from file")
     diff_parser = subparsers.add_parser("diff", description="Show differences between file and Google Calendar")
     upload_parser = subparsers.add_parser("upload", description="Upload birthdays from file to Google Calendar")
+    plan_parser = subparsers.add_parser(
+        "plan", description="Save requests, that upload would send to Google Calendar, to a file, to apply them later"
+    )
+    apply_parser = subparsers.add_parser("apply", description="Send requests from the file, made by 'plan' command")
 
     for subparser in [show_parser, gshow_parser]:
         subparser.add_argument("sort_type", choices=[t for t in BirthdayEvent.SortTypes])
 
-    for subparser in [validate_parser, show_parser, diff_parser, upload_parser]:
+    upcoming_parser.add_argument(
+        "-d",
+        "--days",
+        type=non_negative_int,
+        default=7,
+        help="Number of days after today to look at, 0 for today only (default: 7)",
+    )
+
+    plan_parser.add_argument("plan_file", type=str, help="Path to the file to save the plan to")
+    apply_parser.add_argument("plan_file", type=str, help="Path to the file with the plan")
+
+    for subparser in [validate_parser, show_parser, upcoming_parser, diff_parser, upload_parser, plan_parser]:
         subparser.add_argument("-i", "--input-file", type=str, help="Path to the file with birthdays")
+    apply_parser.add_argument(
+        "-i", "--input-file", type=str, help="Path to the file with birthdays, that the plan is made from"
+    )
 
     upload_parser.add_argument(
         "-f", "--force", action="store_true", help="Force upload even if there are no differences"
     )
     upload_parser.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    for subparser in [upload_parser, plan_parser]:
+        subparser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compare file with events in Google Calendar, even if the journal of the last upload is available",
+        )
+    upload_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the interrupted upload from where it stopped, without comparing events again",
+    )
 
-    for subparser in [validate_parser, show_parser, gshow_parser, diff_parser, upload_parser]:
+    all_parsers = [
+        validate_parser,
+        show_parser,
+        gshow_parser,
+        upcoming_parser,
+        diff_parser,
+        upload_parser,
+        plan_parser,
+        apply_parser,
+    ]
+    for subparser in all_parsers:
         subparser.add_argument("-v", "--verbose", action="count", default=0, help="Display more information")
         subparser.add_argument("-c", "--config-file", type=str, help="Path to the config file")
         add_arguments_to_parser(subparser, config, exclude_params=["verbose", "input_file"])
@@ -100,7 +211,7 @@ def main(cmdline_args: Optional[list] = None) -> int:
         print(config)
 
     args_dict_for_config = copy.deepcopy(args_dict)
-    for key in ["config_file", "command", "sort_type", "force", "yes"]:
+    for key in ["config_file", "command", "sort_type", "days", "force", "yes", "verify", "resume", "plan_file"]:
         args_dict_for_config.pop(key, None)
     args_dict_no_nones = {k: v for k, v in args_dict_for_config.items() if v is not None}
     try:
@@ -133,18 +244,48 @@ def main(cmdline_args: Optional[list] = None) -> int:
         print(config)
     # end update config
 
-    if args.command in ["validate", "show", "diff", "upload"]:
+    if args.command in ["validate", "show", "upcoming", "diff", "upload", "plan"]:
         try:
             reader = FileReader(config)
-            file_events = reader.events
+            file_events: Sequence[BirthdayEvent] = reader.events
+            if args.command in ["upload", "plan"]:
+                # upload goes through events several times, so views of the store are created once
+                file_events = list(file_events)
         except Exception as e:
             print_error(args, e)
             return 2
 
-    if args.command in ["gshow", "diff", "upload"]:
+    if args.command in ["gshow", "diff", "upload", "plan", "apply"]:
         try:
-            gc_api = GoogleCalendarApi(config)
-            google_events = gc_api.get_events()
+            gc_api = create_google_calendar_api(config)
+
+            use_journal = False
+            checkpoint = None
+            if args.command in ["diff", "upload", "plan", "apply"]:
+                journal = UploadJournal(config, gc_api.br_calendar["id"])
+            if args.command in ["upload", "plan"]:
+                use_journal = journal.is_valid and not args.verify and not (args.command == "upload" and args.force)
+            if args.command == "upload" and args.resume:
+                checkpoint = UploadCheckpoint.load(config, gc_api.br_calendar["id"])
+                if checkpoint is None:
+                    print(Colorize.warning("There is no interrupted upload to resume. Uploading as usual"))
+            if args.command == "apply":
+                checkpoint = UploadCheckpoint.from_plan_file(config, gc_api.br_calendar["id"], args.plan_file)
+
+            if checkpoint is not None:
+                pass  # everything to do is in the checkpoint or in the plan
+            elif use_journal:
+                print(
+                    Colorize.info(
+                        "Comparing file with the journal of the last upload. "
+                        "To compare with events in Google Calendar, use --verify"
+                    )
+                )
+                google_events, journal_cmp_result = journal.compare(file_events)
+            else:
+                google_events = gc_api.get_events()
+                if args.command != "gshow":
+                    journal.trust_unchanged(google_events)
         except Exception as e:
             print_error(args, e)
             return 3
@@ -155,18 +296,29 @@ def main(cmdline_args: Optional[list] = None) -> int:
             return 0
         case "show":
             show(file_events, BirthdayEvent.SortTypes(args.sort_type))
+        case "upcoming":
+            upcoming(reader.events, args.days)
         case "gshow":
             show(google_events, BirthdayEvent.SortTypes(args.sort_type))
         case "diff":
-            cmp_result = compare_events_file_and_google(file_events=file_events, google_events=google_events)
+            try:
+                cmp_result = compare_events_file_and_google(file_events=file_events, google_events=google_events)
+            except Exception as e:
+                print_error(args, e)
+                return 4
             print_diff(file_events, google_events, cmp_result, config)
         case "upload":
-            cmp_result = compare_events_file_and_google(file_events=file_events, google_events=google_events)
-            print("---------------------------------")
-            print_diff(file_events, google_events, cmp_result, config)
-            print("---------------------------------")
+            if checkpoint is not None:
+                print(
+                    Colorize.info(
+                        f"Resuming upload: {len(checkpoint.done)} of {checkpoint.n_operations} requests are done, "
+                        f"{checkpoint.n_in_flight} were in flight and will be sent again"
+                    )
+                )
+                return 0 if run_upload(args, gc_api, journal, checkpoint) else 13
 
             if args.force:
+                # events are not compared: all of them are replaced, even duplicates that can't be compared
                 print(
                     Colorize.warning(
                         "Performing force upload.\n"
@@ -174,16 +326,40 @@ def main(cmdline_args: Optional[list] = None) -> int:
                         f"and replaced with events from file."
                     )
                 )
+                if config.recreate_calendar_on_force:
+                    try:
+                        journal.invalidate()
+                        gc_api.recreate_br_calendar()
+                    except Exception as e:
+                        print_error(args, e)
+                        return 11
+                    # the new calendar is empty, and the journal belongs to the old one
+                    journal = UploadJournal(config, gc_api.br_calendar["id"])
+                    google_events = []
+                force_cmp_result = ComparisonResult(events_to_create=list(file_events), events_to_delete=google_events)
+                checkpoint = UploadCheckpoint.make(config, gc_api.br_calendar["id"], file_events, [], force_cmp_result)
                 try:
-                    gc_api.delete_events(google_events)
-                    gc_api.create_events(file_events)
-                except Exception as e:
+                    checkpoint.save()
+                except OSError as e:
                     print_error(args, e)
                     return 11
-                print(Colorize.success("Events uploaded successfully!"))
-                return 0
+                return 0 if run_upload(args, gc_api, journal, checkpoint) else 11
+
+            if use_journal:
+                cmp_result = journal_cmp_result
+            else:
+                try:
+                    cmp_result = compare_events_file_and_google(file_events=file_events, google_events=google_events)
+                except Exception as e:
+                    print_error(args, e)
+                    return 4
+            print("---------------------------------")
+            print_diff(file_events, google_events, cmp_result, config)
+            print("---------------------------------")
 
             if not cmp_result.has_changes:
+                if not use_journal:
+                    journal.record(file_events, google_events)
                 print(Colorize.success("No differences found. Nothing to upload. Exiting."))
                 return 0
             else:
@@ -209,35 +385,45 @@ def main(cmdline_args: Optional[list] = None) -> int:
                         print(Colorize.warning("Upload cancelled."))
                         return 0
 
+                checkpoint = UploadCheckpoint.make(
+                    config, gc_api.br_calendar["id"], file_events, google_events, cmp_result
+                )
                 try:
-                    google_events_aligned = []
-                    file_events_aligned = []
-
-                    def check_duplicates(events, target: str):
-                        """This should never happen because duplicates checks are performed before"""
-                        duplicate_events_str = "\n".join([str(e) for e in events])
-                        assert len(events) == 1, (
-                            f"{target} contains duplicates, updating is not possible.\n"
-                            f"\nDuplicate events:\n{duplicate_events_str}"
-                        )
-
-                    for updated_event in cmp_result.updated_events:
-                        events = [e for e in google_events if e == updated_event]
-                        check_duplicates(events, "Google Calendar")
-                        google_events_aligned += events
-
-                        events = [e for e in file_events if e == updated_event]
-                        check_duplicates(events, "File")
-                        file_events_aligned += events
-
-                    gc_api.delete_events(google_events=[e for e in google_events if e in cmp_result.google_only_events])
-                    gc_api.update_events(file_events=file_events_aligned, google_events=google_events_aligned)
-                    gc_api.create_events(file_events=[e for e in file_events if e in cmp_result.file_only_events])
-                except Exception as e:
+                    checkpoint.save()
+                except OSError as e:
                     print_error(args, e)
                     return 12
-                print(Colorize.success("Events uploaded successfully!"))
-                return 0
+                return 0 if run_upload(args, gc_api, journal, checkpoint) else 12
 
             assert False, "Unreachable code"
+        case "plan":
+            if use_journal:
+                cmp_result = journal_cmp_result
+            else:
+                try:
+                    cmp_result = compare_events_file_and_google(file_events=file_events, google_events=google_events)
+                except Exception as e:
+                    print_error(args, e)
+                    return 4
+            print_diff(file_events, google_events, cmp_result, config)
+
+            checkpoint = UploadCheckpoint.make(config, gc_api.br_calendar["id"], file_events, google_events, cmp_result)
+            estimate = gc_api.estimate_cost(checkpoint.operation_counts)
+            try:
+                save_json(args.plan_file, dict(checkpoint.to_dict(), estimate=estimate))
+            except OSError as e:
+                print_error(args, e)
+                return 14
+            print_plan(checkpoint, estimate, config)
+            print(Colorize.success(f"Plan is saved to {args.plan_file}. To upload, run 'apply {args.plan_file}'"))
+            return 0
+        case "apply":
+            assert checkpoint is not None, "Plan is loaded with Google Calendar"
+            print_plan(checkpoint, gc_api.estimate_cost(checkpoint.operation_counts), config)
+            try:
+                checkpoint.save()  # so that 'upload --resume' can continue, if it's interrupted
+            except OSError as e:
+                print_error(args, e)
+                return 15
+            return 0 if run_upload(args, gc_api, journal, checkpoint) else 15
     return 0
@@ -1,18 +1,28 @@
-import copy
 import dataclasses
 import enum
+import hashlib
+import json
 import urllib.parse
+from array import array
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Hashable, Iterable, Sequence, TypeVar
 
-import pytz
-from dateutil.parser import parse as dateutil_parse
-from dateutil.relativedelta import relativedelta
 from strenum import StrEnum
 
 from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.utils.birthday_calendar import ZODIAC_SIGNS, BirthdayCalendar, now, sorted_order, zodiac_index
 from birthday_reminder.utils.colorize import Colorize
 
+if TYPE_CHECKING:
+    from birthday_reminder.utils.birthday_calendar import BirthdayStats
+
+T = TypeVar("T")
+
+
+class DuplicateEventsError(Exception):
+    """Google Calendar contains events that can't be told apart. They have to be deleted manually"""
+
 
 @dataclass
 class BirthdayEvent:
@@ -34,58 +44,61 @@ class BirthdayEvent:
         if not self.has_year:
             self.date = self.date.replace(year=self._DEFAULT_YEAR)
 
+    def __setattr__(self, name, value):
+        # called for every field on creation, so it writes to __dict__ directly: object.__setattr__ is slower
+        self.__dict__[name] = value
+        if name[0] != "_":
+            self.__dict__["_cache"] = None
+
+    def _cached(self, key: str, compute):
+        """Returns cached value of expensive property. Cache is valid until any field of the event
+        or any variable of its config is set"""
+        config_revision = self.config.revision if self.config else None
+        cache = self.__dict__.get("_cache")
+        if cache is None or cache["config_revision"] != config_revision:
+            cache = {"config_revision": config_revision}
+            super().__setattr__("_cache", cache)
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
     _UNIQUE_TAG = "#birthday_reminder"
     _DATE_OF_BIRTH_KEY = "Date of birth"
     _NO_YEAR_PLACEHOLDER = "...."
     _GENERATED_BY_STR = "Generated by 'Birthday Reminder'"
     _DEFAULT_YEAR = 1904  # important: need to use leap year to avoid issues with Feb 29
+    _CONTENT_HASH_KEY = "birthdayReminderContentHash"  # key in extendedProperties.private of uploaded events
 
     @property
     def date_no_year(self):
         return self.date.replace(year=self._DEFAULT_YEAR)
 
+    @property
+    def _calendar(self) -> BirthdayCalendar:
+        remind_29_feb_on_1_mar = self.config.remind_29_feb_on_1_mar if self.config else False
+        return BirthdayCalendar.get(remind_29_feb_on_1_mar)
+
     @property
     def age(self):
-        now = datetime.now()
-        was_birthday_this_year = (now.month, now.day) >= (self.date.month, self.date.day)
-        return now.year - self.date.year - (not was_birthday_this_year)
+        return self._calendar.age(self.date.year, self.date.month, self.date.day)
 
     @property
     def is_birthday_today(self):
-        now = datetime.now()
-        return (now.month, now.day) == (self.date.month, self.date.day)
+        return self._calendar.is_birthday_today(self.date.month, self.date.day)
 
     @property
     def next_birthday(self):
-        next_birthday = self.date + relativedelta(years=self.age + 1)
-        return next_birthday
+        return datetime.combine(self._calendar.next_birthday(self.date.month, self.date.day), datetime.min.time())
 
     @property
     def days_until_next_birthday(self):
-        return (self.next_birthday - datetime.now()).days
-
-    _ZODIAC_SIGNS = [
-        (("Capricorn", "♑"), (1, 19)),
-        (("Aquarius", "♒"), (2, 18)),
-        (("Pisces", "♓"), (3, 20)),
-        (("Aries", "♈"), (4, 19)),
-        (("Taurus", "♉"), (5, 20)),
-        (("Gemini", "♊"), (6, 20)),
-        (("Cancer", "♋"), (7, 22)),
-        (("Leo", "♌"), (8, 22)),
-        (("Virgo", "♍"), (9, 22)),
-        (("Libra", "♎"), (10, 22)),
-        (("Scorpio", "♏"), (11, 21)),
-        (("Sagittarius", "♐"), (12, 21)),
-        (("Capricorn", "♑"), (12, 31)),  # to handle the case of dates after Dec 21
-    ]
+        return self._calendar.days_until_next_birthday(self.date.month, self.date.day)
+
+    _ZODIAC_SIGNS = ZODIAC_SIGNS
 
     @property
     def zodiac(self):
-        for sign in self._ZODIAC_SIGNS:
-            if (self.date.month, self.date.day) <= sign[1]:
-                return sign[0]
-        raise Exception("Date is invalid. That's weird. Shouldn't get here")
+        return self._ZODIAC_SIGNS[zodiac_index(self.date.month, self.date.day)][0]
 
     @property
     def _zodiac_str(self):
@@ -129,12 +142,16 @@ class BirthdayEvent:
         description = ""
         description += f"{self._DATE_OF_BIRTH_KEY}: {date_of_birth}\n"
         description += f"Zodiac sign: {self.zodiac[1]} ({self.zodiac[0]})\n"
-        description += f"{self._GENERATED_BY_STR} on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        description += f"{self._GENERATED_BY_STR} on {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         description += f"{self._UNIQUE_TAG}\n"
         description += f"Create greeting with Birthday Greetings AI: {self._birthday_greetings_ai_url}\n"
         return description
 
     def __str__(self):
+        return self.display_str(self.age, self.days_until_next_birthday)
+
+    def display_str(self, age, days_until_next_birthday) -> str:
+        """Line shown to user, built from 'age' and 'days_until_next_birthday' computed elsewhere, see print_events"""
         # if google event and not generated by this program - inform user about data loss risks
         if self.is_manually_created_google_event:
             warn_text = Colorize.warning(
@@ -147,30 +164,33 @@ class BirthdayEvent:
             title_birthday_str = Colorize.success(f"{self.display_title}. Birthday is today!")
         else:
             title_birthday_str = self.display_title
-        days_str = "days" if self.days_until_next_birthday != 1 else "day"
+        days_str = "days" if days_until_next_birthday != 1 else "day"
         if self.has_year:
             return (
-                f"{self.date.strftime('%Y-%m-%d')} - {title_birthday_str} - {Colorize.info(self.age)} years old "
-                f"(Will be {Colorize.info(self.age + 1)} in {Colorize.info(self.days_until_next_birthday)} {days_str})"
+                f"{self.date.strftime('%Y-%m-%d')} - {title_birthday_str} - {Colorize.info(age)} years old "
+                f"(Will be {Colorize.info(age + 1)} in {Colorize.info(days_until_next_birthday)} {days_str})"
             )
         else:
             return (
                 f"{self.date.strftime(f'{self._NO_YEAR_PLACEHOLDER}-%m-%d')} - {title_birthday_str} "
-                f"(Next birthday in {Colorize.info(self.days_until_next_birthday)} {days_str})"
+                f"(Next birthday in {Colorize.info(days_until_next_birthday)} {days_str})"
             )
 
     @property
     def _signature(self):
-        return self.date, self.display_title, self.has_year
+        return self._cached("signature", lambda: (self.date, self.display_title, self.has_year))
 
     @property
     def _google_event_signature(self):
         if self.google_event:
             keys_to_compare = ["summary", "description", "start", "end", "recurrence", "reminders"]
             google_event = {k: v for k, v in self.google_event.items() if k in keys_to_compare}
-            google_event = copy.deepcopy(google_event)
+            # only these nested dicts are modified below, so there is no need for slow deepcopy
+            for key in "reminders", "start", "end":
+                if key in google_event:
+                    google_event[key] = dict(google_event[key])
         else:
-            google_event = self.to_google_event()
+            google_event = self._render_google_event()
         reminders = google_event.get("reminders", {}).get("overrides", [])
         if len(reminders) > 0:
             google_event["reminders"]["overrides"] = set([(r["minutes"], r["method"]) for r in reminders])
@@ -181,16 +201,53 @@ class BirthdayEvent:
             if "dateTime" in google_event[key]:
                 # google returns datetime in UTC, so we need to convert it to local timezone
                 if google_event[key]["dateTime"].endswith("Z"):
+                    import pytz
+                    from dateutil.parser import parse as dateutil_parse
+
                     dt = dateutil_parse(google_event[key]["dateTime"])
                     dt = dt.astimezone(pytz.timezone(google_event[key]["timeZone"]))
                     # remove seconds because of conversion errors for years around 1900
                     google_event[key]["dateTime"] = dt.strftime("%Y-%m-%dT%H:%M:00")
         return google_event
 
+    @property
+    def _google_event_signature_str(self) -> str:
+        """Canonical immutable form of _google_event_signature, computed once"""
+        return self._cached(
+            "google_event_signature_str",
+            lambda: json.dumps(self._google_event_signature, sort_keys=True, ensure_ascii=False, default=sorted),
+        )
+
+    @property
+    def _stored_content_hash(self) -> str | None:
+        """Content hash written by 'to_google_event' on upload. None for events uploaded by older versions
+        and for manually created events"""
+        if not self.google_event:
+            return None
+        return self.google_event.get("extendedProperties", {}).get("private", {}).get(self._CONTENT_HASH_KEY)
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the event as it is stored in Google Calendar. Events with equal signatures have equal hashes.
+
+        Google events are hashed structurally, unless 'trust_stored_content_hash' is called for them
+        """
+        return self._cached(
+            "content_hash", lambda: hashlib.sha1(self._google_event_signature_str.encode("utf-8")).hexdigest()
+        )
+
+    def trust_stored_content_hash(self):
+        """Makes the hash written on upload the content hash of the event, so its signature is never built.
+        Manual edits in Google Calendar don't change that hash, so call it only for events that are not edited
+        since upload, see UploadJournal.trust_unchanged"""
+        stored_content_hash = self._stored_content_hash
+        if stored_content_hash is not None:
+            self._cached("content_hash", lambda: stored_content_hash)
+
     def __eq__(self, other):
         if not isinstance(other, BirthdayEvent):
             return NotImplemented
-        return self._signature == other._signature and self._google_event_signature == other._google_event_signature
+        return self._signature == other._signature and self.content_hash == other.content_hash
 
     def __hash__(self):
         return hash(self._signature)
@@ -219,7 +276,42 @@ class BirthdayEvent:
             is_manually_created_google_event=cls._UNIQUE_TAG not in description,
         )
 
+    _PATCH_REPLACED_KEYS = ("start", "end")  # switching between 'date' and 'dateTime' must clear the other one
+    _TIME_KEYS = ("date", "dateTime", "timeZone")
+
+    def google_event_patch(self, google_event: "BirthdayEvent") -> dict:
+        """Fields of 'to_google_event' that differ from 'google_event' as it is stored in Google Calendar.
+
+        Fields are compared in normalized form, like events are, so a new 'Generated by' line alone is not a change.
+        Patch merges nested objects, so stale keys of replaced ones are cleared with None, even if they are unknown
+        """
+        assert google_event.google_event is not None, "Expected event from Google Calendar"
+        stored = google_event.google_event
+        new_event = self.to_google_event()
+        for key in self._PATCH_REPLACED_KEYS:
+            new_event[key] = dict({k: None for k in self._TIME_KEYS if k not in new_event[key]}, **new_event[key])
+        if any(key not in stored for key in new_event if key != "extendedProperties"):
+            return new_event  # stored content is unknown, e.g. for events from upload journal
+
+        new_signature = self._google_event_signature
+        stored_signature = google_event._google_event_signature
+        patch = {}
+        for key, value in new_event.items():
+            if key == "extendedProperties":
+                if google_event._stored_content_hash == self.content_hash:
+                    continue
+            elif new_signature[key] == stored_signature[key]:
+                continue
+            patch[key] = value
+        return patch
+
     def to_google_event(self) -> dict:
+        """Event to upload. Carries its content hash, so it's compared without rebuilding its signature"""
+        google_event = self._render_google_event()
+        google_event["extendedProperties"] = {"private": {self._CONTENT_HASH_KEY: self.content_hash}}
+        return google_event
+
+    def _render_google_event(self) -> dict:
         assert self.config, "Config is not set"
 
         rrule = "RRULE:FREQ=YEARLY"
@@ -244,10 +336,10 @@ class BirthdayEvent:
 
         if self.config.use_time:
             event_time = datetime.strptime(self.config.event_time, "%H:%M")
-            event_time_delta = relativedelta(hours=event_time.hour, minutes=event_time.minute)
+            event_time_delta = timedelta(hours=event_time.hour, minutes=event_time.minute)
 
             event_duration = datetime.strptime(self.config.event_duration, "%H:%M")
-            event_duration_delta = relativedelta(hours=event_duration.hour, minutes=event_duration.minute)
+            event_duration_delta = timedelta(hours=event_duration.hour, minutes=event_duration.minute)
 
             start_datetime = self.date + event_time_delta
             end_datetime = start_datetime + event_duration_delta
@@ -262,7 +354,7 @@ class BirthdayEvent:
                 }
             )
         else:
-            next_day = self.date + relativedelta(days=1)
+            next_day = self.date + timedelta(days=1)
 
             google_event.update(
                 {
@@ -278,19 +370,38 @@ class BirthdayEvent:
         date = enum.auto()
         next = enum.auto()
 
+    @staticmethod
+    def _birthday_calendar(events: Sequence) -> BirthdayCalendar:
+        events_with_config = [e for e in events[:1] if e.config]
+        remind_29_feb_on_1_mar = events_with_config[0].config.remind_29_feb_on_1_mar if events_with_config else False
+        return BirthdayCalendar.get(remind_29_feb_on_1_mar)
+
+    @staticmethod
+    def _date_columns(events: Sequence) -> tuple[list[int], list[int], list[int]]:
+        """Years (0 if unknown), months and days of events"""
+        return (
+            [e.date.year if e.has_year else 0 for e in events],
+            [e.date.month for e in events],
+            [e.date.day for e in events],
+        )
+
+    @classmethod
+    def birthday_stats(cls, events: Sequence) -> "BirthdayStats":
+        """Ages, days until next birthdays and zodiac indices of all events, computed in one pass"""
+        return cls._birthday_calendar(events).stats(*cls._date_columns(events))
+
+    @classmethod
+    def sort_keys(cls, events: Sequence, sort_type: SortTypes) -> array:
+        """Integer sort key of every event, see BirthdayCalendar.sort_keys"""
+        return cls._birthday_calendar(events).sort_keys(*cls._date_columns(events), sort_type)
+
     @classmethod
-    def sort_events(cls, events: list, sort_type: SortTypes):
-        match sort_type:
-            case cls.SortTypes.year:
-                events_with_year = sorted([e for e in events if e.has_year], key=lambda d: d.date)
-                events_without_year = sorted([e for e in events if not e.has_year], key=lambda d: d.date_no_year)
-                return events_with_year + events_without_year
-            case cls.SortTypes.date:
-                return sorted(events, key=lambda d: d.date_no_year)
-            case cls.SortTypes.next:
-                return sorted(events, key=lambda d: d.days_until_next_birthday)
-            case _:
-                raise ValueError(f"Unknown sort type: {sort_type}")
+    def sort_events(cls, events: Iterable, sort_type: SortTypes, keys: Sequence[int] | None = None):
+        """Returns sorted list of events. Their sort 'keys' can be passed if they are already computed"""
+        events = events if isinstance(events, Sequence) else list(events)
+        if keys is None:
+            keys = cls.sort_keys(events, sort_type)
+        return [events[idx] for idx in sorted_order(keys)]
 
 
 class BirthdayEventSignature(BirthdayEvent):
@@ -321,38 +432,76 @@ class ComparisonResult:
     equal_events: set[BirthdayEvent] = dataclasses.field(default_factory=set)
     updated_events: set[BirthdayEvent] = dataclasses.field(default_factory=set)
 
+    # the same changes, ready to be uploaded: actual events from file and Google Calendar, in their original order
+    events_to_create: list[BirthdayEvent] = dataclasses.field(default_factory=list)
+    events_to_delete: list[BirthdayEvent] = dataclasses.field(default_factory=list)
+    updated_pairs: list[tuple[BirthdayEvent, BirthdayEvent]] = dataclasses.field(default_factory=list)  # (file, google)
+
     @property
     def has_changes(self):
         return any([self.file_only_events, self.google_only_events, self.updated_events])
 
 
+def find_duplicates(items: Iterable[T], key: Callable[[T], Hashable] | None = None) -> list[list[T]]:
+    """Returns groups of items with equal keys (items themselves by default), in order of first occurrence.
+
+    Items are grouped in a dict, so it takes linear time: equality is checked only for keys with equal hashes.
+    """
+    groups: dict[Hashable, list[T]] = {}
+    for item in items:
+        groups.setdefault(item if key is None else key(item), []).append(item)
+    return [group for group in groups.values() if len(group) > 1]
+
+
 def compare_events_file_and_google(
-    file_events: list[BirthdayEvent], google_events: list[BirthdayEvent]
+    file_events: Iterable[BirthdayEvent], google_events: list[BirthdayEvent]
 ) -> ComparisonResult:
-    file_events_set = set(file_events)
-    # impossible, already checked in FileReader
-    assert len(file_events_set) == len(file_events), "File contains duplicates"
-
     google_events_set = set(google_events)
     if len(google_events_set) != len(google_events):
-        duplicate_events = [e for e in google_events if google_events.count(e) > 1]
-        duplicate_events_str = "\n".join([str(e) for e in duplicate_events])
-        assert len(google_events_set) < len(google_events), (
+        duplicate_groups = find_duplicates(google_events)
+        duplicate_events_str = "\n---\n".join(["\n".join([str(e) for e in group]) for group in duplicate_groups])
+        raise DuplicateEventsError(
             "Google Calendar contains duplicates. Did you edit the calendar manually?\n"
-            "Please delete duplicates manually and try again.\n"
+            "Please delete duplicates manually, or replace all events with 'upload --force'.\n"
             f"Duplicate events:\n{duplicate_events_str}"
         )
 
-    cmp_result = ComparisonResult()
+    # signature index: only events with the same signature have to be compared in full
+    google_events_by_signature: dict[tuple, list[BirthdayEvent]] = {}
+    for google_event in google_events:
+        google_events_by_signature.setdefault(google_event._signature, []).append(google_event)
 
-    cmp_result.equal_events = file_events_set & google_events_set
-    file_events_set -= cmp_result.equal_events
-    google_events_set -= cmp_result.equal_events
+    cmp_result = ComparisonResult()
+    leftover_ids: set[int] = set()
+    file_signatures: set[tuple] = set()
+    for file_event in file_events:
+        # impossible, already checked in FileReader
+        assert file_event._signature not in file_signatures, "File contains duplicates"
+        file_signatures.add(file_event._signature)
+
+        candidates = google_events_by_signature.pop(file_event._signature, [])
+        equal_candidates = [e for e in candidates if e == file_event]
+        if equal_candidates:
+            cmp_result.equal_events.add(file_event)
+            # events with the same signature, but different content are leftovers, e.g. from manual editing
+            leftover_ids |= {id(e) for e in candidates if e is not equal_candidates[0]}
+        elif len(candidates) == 1:
+            cmp_result.updated_pairs.append((file_event, candidates[0]))
+        elif len(candidates) == 0:
+            cmp_result.events_to_create.append(file_event)
+        else:
+            candidates_str = "\n".join([str(e) for e in candidates])
+            raise DuplicateEventsError(
+                "Google Calendar contains duplicates, updating is not possible.\n"
+                "Please delete duplicates manually, or replace all events with 'upload --force'.\n"
+                f"Duplicate events:\n{candidates_str}"
+            )
 
-    file_events_signature_set = {BirthdayEventSignature.from_event(e) for e in file_events_set}
-    google_events_signature_set = {BirthdayEventSignature.from_event(e) for e in google_events_set}
+    cmp_result.events_to_delete = [
+        e for e in google_events if e._signature in google_events_by_signature or id(e) in leftover_ids
+    ]
 
-    cmp_result.updated_events = file_events_signature_set & google_events_signature_set
-    cmp_result.file_only_events = file_events_signature_set - google_events_signature_set
-    cmp_result.google_only_events = google_events_signature_set - file_events_signature_set
+    cmp_result.updated_events = {BirthdayEventSignature.from_event(f) for f, _ in cmp_result.updated_pairs}
+    cmp_result.file_only_events = {BirthdayEventSignature.from_event(e) for e in cmp_result.events_to_create}
+    cmp_result.google_only_events = {BirthdayEventSignature.from_event(e) for e in cmp_result.events_to_delete}
     return cmp_result
@@ -1,17 +1,22 @@
 import argparse
+import functools
 import os
+from types import ModuleType
 from typing import Iterable
 
-import yaml
 
+def _yaml() -> ModuleType:
+    import yaml  # slow to import, and configs are imported before parsing arguments
 
-class SafeDumperNoAliases(yaml.SafeDumper):
+    return yaml
+
+
+@functools.cache
+def safe_dumper_no_aliases():
     """
     A dumper that will never emit aliases.
     """
-
-    def ignore_aliases(self, data):
-        return True
+    return type("SafeDumperNoAliases", (_yaml().SafeDumper,), {"ignore_aliases": lambda self, data: True})
 
 
 class BaseConfig:
@@ -19,9 +24,21 @@ class BaseConfig:
 
     def __init__(self):
         self._file_path = None
+        self._revision = 0
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        if not key.startswith("_"):
+            # lets objects that depend on config cache derived values until config is changed
+            super().__setattr__("_revision", getattr(self, "_revision", 0) + 1)
+
+    @property
+    def revision(self) -> int:
+        """Changes every time a public variable is set"""
+        return self._revision
 
     def __repr__(self):
-        return f"{self.__class__.__name__}:\n---\n{yaml.dump(self.get_public_vars())}---\n"
+        return f"{self.__class__.__name__}:\n---\n{_yaml().dump(self.get_public_vars())}---\n"
 
     def get_file_path(self):
         return self._file_path
@@ -52,7 +69,7 @@ class BaseConfig:
         assert ext == ".yaml", "Config should be a .yaml file!"
 
         with open(file_path, "r", encoding="utf-8") as inf:
-            data_dict = yaml.safe_load(inf)
+            data_dict = _yaml().safe_load(inf)
         return data_dict
 
     def load_from_file(self):
@@ -73,7 +90,7 @@ class BaseConfig:
 
         public_vars = self.get_public_vars()
         with open(file_path, "w", encoding="utf-8") as outf:
-            yaml.dump(public_vars, outf, Dumper=SafeDumperNoAliases)
+            _yaml().dump(public_vars, outf, Dumper=safe_dumper_no_aliases())
 
 
 def add_arguments_to_parser(parser: argparse.ArgumentParser, config: BaseConfig, exclude_params: Iterable = ()):
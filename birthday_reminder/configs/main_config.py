@@ -1,9 +1,6 @@
 import os.path
 import sys
 
-import yaml
-from cerberus import Validator
-
 from birthday_reminder.configs.base_config import BaseConfig
 
 if getattr(sys, "frozen", False):
@@ -22,8 +19,12 @@ MAIN_CONFIG_FILE = os.path.join(_PROJECT_DIR, "main_config.yaml")
 class MainConfig(BaseConfig):
     @staticmethod
     def _validate(data: dict):
+        import yaml
+        from cerberus import Validator
+
         request_schema = {
             "input_file": {"type": "string", "required": True},
+            "cache_dir": {"type": "string", "required": True},
             # "date_format_year": {"type": "string", "required": True, "regex": r"\S+"},
             # "date_format_no_year": {"type": "string", "required": True, "regex": r"\S+"},
             "use_zodiac_signs": {"type": "boolean", "required": True},
@@ -31,6 +32,8 @@ class MainConfig(BaseConfig):
             "title_prefix": {"type": "string", "required": True},
             "title_postfix": {"type": "string", "required": True},
             "calendar_name": {"type": "string", "required": True},
+            "calendar_id_ttl_hours": {"type": "integer", "required": True, "min": 0},
+            "recreate_calendar_on_force": {"type": "boolean", "required": True},
             "google_oauth_port": {"type": "integer", "required": True, "min": 1025, "max": 65535},
             "use_time": {"type": "boolean", "required": True},
             "time_zone": {"type": "string", "required": True},
@@ -39,6 +42,12 @@ class MainConfig(BaseConfig):
             "remind_29_feb_on_1_mar": {"type": "boolean", "required": True},
             "popup_reminders_minutes": {"type": "list", "required": True, "schema": {"type": "integer"}},
             "email_reminders_minutes": {"type": "list", "required": True, "schema": {"type": "integer"}},
+            "parse_workers": {"type": "integer", "required": True, "min": 1, "max": 64},
+            "use_batch_requests": {"type": "boolean", "required": True},
+            "workers": {"type": "integer", "required": True, "min": 1, "max": 64},
+            "qps": {"type": "float", "required": True, "min": 0.1},
+            "use_async_driver": {"type": "boolean", "required": True},
+            "use_incremental_sync": {"type": "boolean", "required": True},
             "verbose": {"type": "integer", "required": True, "min": 0},
         }
         validator = Validator(request_schema)
@@ -61,6 +70,7 @@ class MainConfig(BaseConfig):
         super().__init__()
 
         self.input_file = os.path.join(_PROJECT_DIR, "Birthdays.txt")
+        self.cache_dir = os.path.join(_PROJECT_DIR, "cache")
 
         # self.date_format_year = "%Y-%m-%d"  # won't support fancy formats for now. Maybe later.
         # self.date_format_no_year = "%m-%d"
@@ -70,6 +80,8 @@ class MainConfig(BaseConfig):
         self.title_postfix = ""
 
         self.calendar_name = "Birthday Reminder"
+        self.calendar_id_ttl_hours = 24
+        self.recreate_calendar_on_force = False
 
         self.google_oauth_port = 58585
 
@@ -82,6 +94,13 @@ class MainConfig(BaseConfig):
 
         self.popup_reminders_minutes = [10, 60 * 24 * 7]
         self.email_reminders_minutes = [10, 60 * 24, 60 * 24 * 7]
+
+        self.parse_workers = 1
+        self.use_batch_requests = False
+        self.workers = 1
+        self.qps = 5.0
+        self.use_async_driver = False
+        self.use_incremental_sync = False
         self.verbose = 0
 
         self._validate(self.get_public_vars())
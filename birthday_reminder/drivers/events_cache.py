@@ -0,0 +1,73 @@
+import hashlib
+import json
+import mmap
+import os.path
+from typing import Optional
+
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+
+
+class EventsCache:
+    """Binary cache of events parsed from the input file.
+
+    The cache file is a json line with the key, followed by the EventStore image. The key consists of
+    size, mtime and hash of the input file, and config fields that affect display titles of events.
+    If anything of it changes, the file is parsed again. Only valid files are cached.
+    """
+
+    _VERSION = 1
+    _DISPLAY_TITLE_FIELDS = ["title_prefix", "title_postfix", "use_zodiac_signs", "use_zodiac_names"]
+    _HASH_CHUNK_BYTES = 2**20
+
+    def __init__(self, config: MainConfig):
+        self.config = config
+        path_hash = hashlib.sha1(os.path.abspath(config.input_file).encode("utf-8"))
+        self.file_path = os.path.join(config.cache_dir, f"parsed_events_{path_hash.hexdigest()[:16]}.bin")
+        self.key = self._make_key()
+
+    def _make_key(self) -> Optional[bytes]:
+        """Key of the current state of input file and config. None if file can't be read"""
+        try:
+            stat = os.stat(self.config.input_file)
+            content_hash = hashlib.sha1()
+            with open(self.config.input_file, "rb") as f:
+                while chunk := f.read(self._HASH_CHUNK_BYTES):
+                    content_hash.update(chunk)
+        except OSError:
+            return None
+
+        key = dict(
+            version=self._VERSION,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha1=content_hash.hexdigest(),
+            config={field: getattr(self.config, field) for field in self._DISPLAY_TITLE_FIELDS},
+        )
+        return json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def load(self) -> Optional[EventStore]:
+        """Events from cache, or None if there is no cache for the current key"""
+        if self.key is None:
+            return None
+        try:
+            with open(self.file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[: len(self.key)] != self.key:
+                    return None
+                return EventStore.from_bytes(self.config, data, offset=len(self.key))
+        except (OSError, ValueError):  # no cache, empty or corrupted file
+            return None
+
+    def save(self, store: EventStore):
+        """Writes cache atomically. Failure to write is not an error, the file will be parsed next time"""
+        if self.key is None:
+            return
+        tmp_file_path = f"{self.file_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+            with open(tmp_file_path, "wb") as f:
+                f.write(self.key)
+                f.write(store.to_bytes())
+            os.replace(tmp_file_path, self.file_path)
+        except OSError:
+            pass
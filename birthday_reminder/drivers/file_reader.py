@@ -1,8 +1,15 @@
+import collections
+import io
+import itertools
+import os
 import re
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterable, Iterator
 
-from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.birthday_event import BirthdayEvent, find_duplicates
+from birthday_reminder.drivers.events_cache import EventsCache
+from birthday_reminder.event_store import EventStore
 from birthday_reminder.utils.colorize import Colorize
 
 
@@ -32,98 +39,205 @@ class ParseError(TextLine):
 
 
 class FileReader:
-    @staticmethod
-    def _parse_lines(config, lines):
-        dates: list[BirthdayLine] = []
-        errors: list[ParseError] = []
-        text_lines: list[TextLine] = []
+    """Reads events from birthdays file.
+
+    The file is parsed lazily, line by line: only events are kept in memory, not the lines themselves.
+    Errors are printed as soon as they are found.
+    """
+
+    _NO_YEAR = 1904  # 1904 is a leap year, so it will work for all dates in a year
+    # the same dates that strptime accepts with "%Y-%m-%d" format, except non-ASCII digits
+    _DATE_RE = re.compile(r"(?:([0-9]{4})-)?([0-9]{1,2})-([0-9]{1,2})")
+    _DAYS_IN_MONTH = [0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+    @classmethod
+    def _parse_date_fast(cls, date_str: str) -> tuple[datetime, bool] | None:
+        """Parses "YYYY-MM-DD" or "MM-DD" date without strptime. Returns (date, has_year) or None if date is invalid"""
+        match = cls._DATE_RE.fullmatch(date_str)
+        if match is None:
+            return None
+        year_str, month_str, day_str = match.groups()
+        year = int(year_str) if year_str is not None else cls._NO_YEAR
+        month = int(month_str)
+        day = int(day_str)
+
+        if year < 1 or not 1 <= month <= 12 or not 1 <= day <= cls._DAYS_IN_MONTH[month]:
+            return None
+        if month == 2 and day == 29 and not (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+            return None
+        return datetime(year, month, day), year_str is not None
+
+    @classmethod
+    def _parse_line_fields(cls, line: str) -> tuple[str, str | tuple[datetime, str, bool] | None]:
+        """Parses line without creating objects, so that results are cheap to send between processes.
+
+        Returns line without line end and one of: None for empty line, error text, or (date, title, has_year)
+        """
+        line_no_end = line.rstrip("\n")
+
+        line_no_comment_strip = line.partition("#")[0].strip()
+        if not line_no_comment_strip:
+            return line_no_end, None
+
+        parts = line_no_comment_strip.split(maxsplit=1)
+        if len(parts) < 2:
+            return line_no_end, "Expected title after date"
+        date_str, title = parts
+
+        parsed_date = cls._parse_date_fast(date_str)
+        if parsed_date is not None:
+            date, has_year = parsed_date
+            return line_no_end, (date, title, has_year)
+
+        # slow path for invalid dates (or exotic ones, like non-ASCII digits): strptime errors explain what is wrong
+        try:
+            date = datetime.strptime(date_str, "%Y-%m-%d")
+            has_year = True
+        except ValueError as e:
+            try:
+                date_str_year = f"{cls._NO_YEAR}-{date_str}"
+                date = datetime.strptime(date_str_year, "%Y-%m-%d")
+                has_year = False
+            except ValueError as e2:
+                return (
+                    line_no_end,
+                    f'Wrong date format: "{date_str}".\n'
+                    f'It does not match neither "YYYY-MM-DD" nor "MM-DD":\n'
+                    f'- "YYYY-MM-DD" -> Error: {e}\n'
+                    f'- "MM-DD" -> Error: {e2}',
+                )
+        return line_no_end, (date, title, has_year)
 
+    @staticmethod
+    def _make_text_line(config, idx: int, line_no_end: str, fields) -> TextLine:
+        if fields is None:
+            return TextLine(idx, line_no_end)
+        if isinstance(fields, str):
+            return ParseError(idx, line_no_end, fields)
+        date, title, has_year = fields
+        return BirthdayLine(idx, line_no_end, BirthdayEvent(date, title, has_year=has_year, config=config))
+
+    @classmethod
+    def _parse_lines(cls, config, lines: Iterable[str]) -> Iterator[TextLine]:
         for idx, line in enumerate(lines):
+            yield cls._make_text_line(config, idx, *cls._parse_line_fields(line))
+
+    _CHUNK_BYTES = 4 * 2**20
+
+    @classmethod
+    def _split_to_chunks(cls, input_file: str) -> list[tuple[int, int]]:
+        """Splits file into byte ranges of about _CHUNK_BYTES, that start and end on line boundaries"""
+        size = os.path.getsize(input_file)
+        chunks = []
+        with open(input_file, "rb") as f:
+            start = 0
+            while start < size:
+                f.seek(min(start + cls._CHUNK_BYTES, size))
+                f.readline()  # move to the end of the line
+                end = min(f.tell(), size)
+                chunks.append((start, end))
+                start = end
+        return chunks
+
+    @classmethod
+    def _parse_chunk(cls, input_file: str, start: int, end: int) -> list[tuple]:
+        """Runs in worker process. Returns results of _parse_line_fields for every line of the chunk"""
+        with open(input_file, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        # the same decoding and newline handling as in open(input_file, encoding="utf-8")
+        lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
+        return [cls._parse_line_fields(line) for line in lines]
+
+    @classmethod
+    def _parse_file_parallel(cls, config, chunks: list[tuple[int, int]]) -> Iterator[tuple]:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=config.parse_workers) as executor:
+            # only a few chunks are parsed ahead, so memory doesn't grow if the consumer is slower than workers
+            futures: collections.deque = collections.deque()
+            chunks_iter = iter(chunks)
+            while True:
+                for start, end in itertools.islice(chunks_iter, 2 * config.parse_workers - len(futures)):
+                    futures.append(executor.submit(cls._parse_chunk, config.input_file, start, end))
+                if not futures:
+                    break
+                yield from futures.popleft().result()
+
+    @classmethod
+    def _parse_file_fields(cls, config) -> Iterator[tuple]:
+        """Yields results of _parse_line_fields for every line of config.input_file.
+
+        If config.parse_workers > 1 and the file is big, it's parsed by a pool of processes, chunk by chunk.
+        The result is the same, including order of lines.
+        """
+        if config.parse_workers > 1:
+            chunks = cls._split_to_chunks(config.input_file)
+            if len(chunks) > 1:
+                yield from cls._parse_file_parallel(config, chunks)
+                return
 
-            def add_error(error_text):
-                pe = ParseError(idx, line_no_end, error_text)
-                errors.append(pe)
-                text_lines.append(pe)
-
-            line_no_end = line.rstrip("\n")
-
-            line_no_comment_strip = line.split("#")[0].strip()
-            if re.fullmatch(r"\s*", line_no_comment_strip):
-                text_lines.append(TextLine(idx, line_no_end))
-                continue
-
-            parts = line_no_comment_strip.split()
-            if len(parts) < 2:
-                add_error("Expected title after date")
-                continue
-            date_str = parts[0]
-            title = line_no_comment_strip[len(date_str) :].strip()
-            if len(title) == 0:
-                add_error("Expected title after date")
-                continue
+        with open(config.input_file, encoding="utf-8") as f:
+            for line in f:
+                yield cls._parse_line_fields(line)
 
-            try:
-                date = datetime.strptime(date_str, "%Y-%m-%d")
-                has_year = True
-            except ValueError as e:
-                try:
-                    date_str_year = f"1904-{date_str}"  # 1904 is a leap year, so it will work for all dates in a year
-                    date = datetime.strptime(date_str_year, "%Y-%m-%d")
-                    has_year = False
-                except ValueError as e2:
-                    add_error(
-                        f'Wrong date format: "{date_str}".\n'
-                        f'It does not match neither "YYYY-MM-DD" nor "MM-DD":\n'
-                        f'- "YYYY-MM-DD" -> Error: {e}\n'
-                        f'- "MM-DD" -> Error: {e2}'
-                    )
-                    continue
-
-            be = BirthdayEvent(date, title, has_year=has_year, config=config)
-            bl = BirthdayLine(idx, line_no_end, be)
-            dates.append(bl)
-            text_lines.append(bl)
-
-        return dates, errors, text_lines
+    @classmethod
+    def parse_file(cls, config) -> Iterator[TextLine]:
+        """Yields parsed lines of config.input_file one by one: BirthdayLine, ParseError or just TextLine"""
+        for idx, (line_no_end, fields) in enumerate(cls._parse_file_fields(config)):
+            yield cls._make_text_line(config, idx, line_no_end, fields)
 
     @staticmethod
-    def _visualize_parsed(config, dates, errors, text_lines):
-        if len(errors) > 0:
-            print(f"Found {len(errors)} errors:\n---")
-            for error in errors:
-                print(error)
-            print("---")
-
-        if config.verbose:
-            print(f"Found {len(dates)} dates:\n---")
-            for date in dates:
-                print(date)
-            print("---")
-
-        if config.verbose >= 2:
-            print(f"Found {len(text_lines)} lines:\n---")
-            for text_line in text_lines:
-                print(text_line)
-            print("---")
+    def _visualize_line(config, text_line: TextLine, n_errors: int):
+        if config.verbose >= 2 or (config.verbose and isinstance(text_line, BirthdayLine)):
+            print(text_line)
+        elif isinstance(text_line, ParseError):
+            if n_errors == 1 and not config.verbose:
+                print("Found errors:\n---")
+            print(text_line)
 
     def __init__(self, config):
-        with open(config.input_file, encoding="utf-8") as f:
-            lines = f.readlines()
-        dates, errors, text_lines = self._parse_lines(config, lines)
-
-        self._visualize_parsed(config, dates, errors, text_lines)
-        if len(errors) > 0:
-            raise ValueError(f"File has {len(errors)} errors! Please fix them before continuing.")
-
-        events = [date.event for date in dates]
+        # in verbose mode every line is printed, so the file is always parsed
+        cache = None if config.verbose else EventsCache(config)
+        cached_store = cache.load() if cache is not None else None
+        if cached_store is not None:
+            self.events = cached_store
+            return
+
+        # events are stored compactly, BirthdayLine and BirthdayEvent objects are created only for printing
+        store = EventStore(config)
+        n_errors = 0
+        n_lines = 0
+        for idx, (line_no_end, fields) in enumerate(self._parse_file_fields(config)):
+            n_lines += 1
+            is_error = isinstance(fields, str)
+            if is_error:
+                n_errors += 1
+            elif fields is not None and n_errors == 0:
+                # after the first error events are useless, there is no need to keep them
+                store.append(*fields)
+            if is_error or config.verbose:
+                self._visualize_line(config, self._make_text_line(config, idx, line_no_end, fields), n_errors)
+
+        if n_errors > 0:
+            print("---")
+            raise ValueError(f"File has {n_errors} errors! Please fix them before continuing.")
 
-        if len(events) != len(set(events)):
-            duplicate_events = [event for event in events if events.count(event) > 1]
-            duplicate_lines = [line for line in dates if line.event in duplicate_events]
-            duplicate_lines_str = "\n".join([f"{line.line_idx}: {line.line_text}" for line in duplicate_lines])
+        if config.verbose:
+            print(f"Found {len(store)} dates in {n_lines} lines")
+
+        if store.has_duplicates():
+            # rare case, so the file is parsed again to get lines, instead of keeping all of them in memory
+            dates = [line for line in self.parse_file(config) if isinstance(line, BirthdayLine)]
+            duplicate_groups = find_duplicates(dates, key=lambda line: line.event)
+            duplicate_lines_str = "\n---\n".join(
+                ["\n".join([f"{line.line_idx}: {line.line_text}" for line in group]) for group in duplicate_groups]
+            )
             raise ValueError(
-                f"File has duplicate events! Please remove them before continuing.\n"
+                f"File has {len(duplicate_groups)} groups of duplicate events! Please remove them before continuing.\n"
                 f"Duplicates:\n{duplicate_lines_str}"
             )
 
-        self.events = events
+        if cache is not None:
+            cache.save(store)
+        self.events = store
@@ -1,20 +1,30 @@
 import enum
+import hashlib
 import json
+import math
 import os.path
 import sys
+import threading
 import time
-from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
 
 import tqdm
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 
-from birthday_reminder.birthday_event import BirthdayEvent, BirthdayEventSignature
+from birthday_reminder.birthday_event import BirthdayEvent
 from birthday_reminder.configs.main_config import MainConfig
 from birthday_reminder.utils.colorize import Colorize
+from birthday_reminder.utils.json_file import load_json, save_json
+from birthday_reminder.utils.rate_limiter import RateLimiter
 
 
 class GoogleApiAuth:
@@ -81,28 +91,226 @@ class GoogleApiAuth:
         return self.creds.token
 
 
+class EventsSnapshot:
+    """Local copy of events of one calendar, with the sync token to download only changes made after it"""
+
+    def __init__(self, cache_dir: str, calendar_id: str):
+        calendar_hash = hashlib.sha1(calendar_id.encode("utf-8")).hexdigest()[:16]
+        self.file_path = os.path.join(cache_dir, f"events_snapshot_{calendar_hash}.json")
+        self.calendar_id = calendar_id
+
+        data = load_json(self.file_path, default={})
+        if data.get("calendar_id") != calendar_id:
+            data = {}
+        self.sync_token: str | None = data.get("sync_token")
+        self.events: dict[str, dict] = data.get("events", {})
+
+    def reset(self, events: list[dict], sync_token: str | None):
+        self.events = {event["id"]: event for event in events}
+        self.sync_token = sync_token
+
+    def merge(self, changed_events: list[dict], sync_token: str | None):
+        for event in changed_events:
+            if event.get("status") == "cancelled":
+                self.events.pop(event["id"], None)
+            else:
+                self.events[event["id"]] = event
+        self.sync_token = sync_token
+
+    def save(self):
+        save_json(self.file_path, dict(calendar_id=self.calendar_id, sync_token=self.sync_token, events=self.events))
+
+    def remove(self):
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
+
+
+class CalendarIdCache:
+    """Index of user's calendars by name, persisted between runs. Saves listing of all calendars on every run.
+
+    It's filled from the full list of calendars, and with calendars created by the program.
+    Names shared by several calendars are ambiguous, they are not remembered.
+    Entries expire after 'ttl_hours', in case the calendar was renamed or deleted manually. 0 disables the cache
+    """
+
+    def __init__(self, cache_dir: str, ttl_hours: int):
+        self.file_path = os.path.join(cache_dir, "calendar_ids.json")
+        self.ttl_s = ttl_hours * 3600
+        self._entries: dict[str, dict] = load_json(self.file_path, default={})  # name -> {calendar, saved_at}
+
+    def get(self, name: str) -> dict | None:
+        entry = self._entries.get(name)
+        if entry is None or time.time() - entry["saved_at"] >= self.ttl_s:
+            return None
+        return entry["calendar"]
+
+    def put(self, name: str, calendar: dict):
+        self._entries[name] = dict(
+            calendar={"id": calendar["id"], "summary": calendar["summary"]}, saved_at=time.time()
+        )
+        save_json(self.file_path, self._entries)
+
+    def update(self, calendars: Iterable[dict]) -> dict[str, list[dict]]:
+        """Replaces entries with the full list of calendars. Returns all calendars by name, including ambiguous"""
+        calendars_by_name: dict[str, list[dict]] = {}
+        for calendar in calendars:
+            calendars_by_name.setdefault(calendar["summary"], []).append(calendar)
+
+        saved_at = time.time()
+        self._entries = {
+            name: dict(calendar={"id": group[0]["id"], "summary": name}, saved_at=saved_at)
+            for name, group in calendars_by_name.items()
+            if len(group) == 1
+        }
+        save_json(self.file_path, self._entries)
+        return calendars_by_name
+
+    def remove(self, name: str):
+        if self._entries.pop(name, None) is not None:
+            save_json(self.file_path, self._entries)
+
+
 class GoogleCalendarApi:
-    def __init__(self, config: MainConfig):
+    _DISCOVERY_FILE = "discovery_calendar_v3.json"
+
+    def __init__(self, config: MainConfig, http=None):
+        """If 'http' is provided, it is used as a transport instead of authorized connection. Useful for tests"""
         self.config = config
 
-        creds = GoogleApiAuth(config.google_oauth_port).creds
-        self.service = build("calendar", "v3", credentials=creds)
+        self._http = http
+        self._creds: Credentials | None = None
+        self._connect()
+
+        # shared by create, update and delete phases, so that all of them respect the same quota
+        self._rate_limiter = RateLimiter(config.qps, self._DELAYS)
+        self._executor: ThreadPoolExecutor | None = None
+        self._thread_local = threading.local()
+        self.bytes_sent = 0  # size of event bodies sent by create and update, see _count_bytes_sent
 
+        self._calendar_id_cache = CalendarIdCache(config.cache_dir, config.calendar_id_ttl_hours)
         self.br_calendar = self._create_br_calendar_if_not_exist()
 
-    def _get_calendars(self) -> dict:
-        return self.service.calendarList().list().execute()
+    def _connect(self):
+        """Sets up the transport: authorizes, unless 'http' is provided"""
+        if self._http is None:
+            self._creds = GoogleApiAuth(self.config.google_oauth_port).creds
+            self.service = self._build_service(credentials=self._creds)
+        else:
+            self.service = self._build_service(http=self._http)
+
+    def _build_service(self, **kwargs):
+        """Builds service from a copy of discovery document, pinned in cache_dir.
+
+        The copy is taken from the document bundled with googleapiclient, so it's never downloaded,
+        and the API doesn't change under the program when the library is updated.
+        """
+        file_path = os.path.join(self.config.cache_dir, self._DISCOVERY_FILE)
+        document = load_json(file_path)
+        if document is None:
+            document = json.loads(discovery_cache.get_static_doc("calendar", "v3"))
+            save_json(file_path, document)
+        return build_from_document(document, **kwargs)
+
+    # only ids and names are needed, so the rest is not transferred
+    _CALENDAR_LIST_PARAMS = dict(maxResults=250, fields="items(id,summary),nextPageToken")
+
+    def _get_calendars(self, params: dict) -> dict:
+        return self.service.calendarList().list(**params).execute()
+
+    def _list_calendars(self) -> list[dict]:
+        """Requests all pages of the list of calendars"""
+        calendars = []
+        page_token = None
+        while True:
+            result = self._get_calendars(dict(self._CALENDAR_LIST_PARAMS, pageToken=page_token))
+            calendars.extend(result.get("items", []))
+
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return calendars
+
+    def _insert_calendar(self, calendar_prefs: dict) -> dict:
+        return self.service.calendars().insert(body=calendar_prefs).execute()
+
+    def _update_calendar(self, calendar: dict) -> dict:
+        return self.service.calendars().update(calendarId=calendar["id"], body=calendar).execute()
+
+    def _get_calendar(self, calendar_id: str) -> dict:
+        return self.service.calendars().get(calendarId=calendar_id).execute()
+
+    def _delete_calendar(self, calendar_id: str):
+        self.service.calendars().delete(calendarId=calendar_id).execute()
+
+    def _get_calendar_list_entry(self, calendar_id: str) -> dict:
+        return self.service.calendarList().get(calendarId=calendar_id).execute()
+
+    def _patch_calendar_list_entry(self, calendar_id: str, entry: dict) -> dict:
+        return self.service.calendarList().patch(calendarId=calendar_id, body=entry).execute()
+
+    # settings of calendar itself, and settings of user's view of it: color, reminders, notifications
+    _CALENDAR_SETTINGS = ["summary", "description", "location", "timeZone"]
+    _CALENDAR_LIST_ENTRY_SETTINGS = [
+        "colorId",
+        "hidden",
+        "selected",
+        "summaryOverride",
+        "defaultReminders",
+        "notificationSettings",
+    ]
+
+    def recreate_br_calendar(self):
+        """Replaces the calendar with an empty one, that has the same settings.
+
+        Takes 5 requests regardless of the number of events, while deleting events takes one request per event.
+        The new calendar has another id, so caches of the old one are replaced. Sharing settings are not copied
+        """
+        old_id = self.br_calendar["id"]
+        calendar = self._get_calendar(old_id)
+        entry = self._get_calendar_list_entry(old_id)
+
+        print(f"Recreating calendar '{self.config.calendar_name}'...")
+        self._delete_calendar(old_id)
+        self._calendar_id_cache.remove(self.config.calendar_name)
+        EventsSnapshot(self.config.cache_dir, old_id).remove()
+
+        new_calendar = self._insert_calendar({k: calendar[k] for k in self._CALENDAR_SETTINGS if k in calendar})
+        entry_settings = {k: entry[k] for k in self._CALENDAR_LIST_ENTRY_SETTINGS if k in entry}
+        if entry_settings:
+            self._patch_calendar_list_entry(new_calendar["id"], entry_settings)
+
+        self.br_calendar = new_calendar
+        self._br_calendar_is_cached = False
+        self._calendar_id_cache.put(self.config.calendar_name, new_calendar)
 
     def _create_br_calendar_if_not_exist(self):
+        name = self.config.calendar_name
+        br_calendar = self._calendar_id_cache.get(name)
+        if br_calendar is not None:
+            self._br_calendar_is_cached = True
+            if self.config.verbose:
+                print(f"Calendar '{name}' is taken from cache: {br_calendar['id']}")
+            return br_calendar
+        self._br_calendar_is_cached = False
+        br_calendar = self._find_or_create_br_calendar()
+        self._calendar_id_cache.put(name, br_calendar)
+        return br_calendar
+
+    def _find_or_create_br_calendar(self):
         name = self.config.calendar_name
         br_calendar = None
 
-        calendars = self._get_calendars()
-        for calendar in calendars["items"]:
-            if calendar["summary"] == name:
-                print(f"Calendar '{name}' already exists")
-                br_calendar = calendar
-                break
+        same_name_calendars = self._calendar_id_cache.update(self._list_calendars()).get(name, [])
+        if len(same_name_calendars) > 1:
+            ids = ", ".join(calendar["id"] for calendar in same_name_calendars)
+            raise Exception(
+                f"There are {len(same_name_calendars)} calendars named '{name}': {ids}\n"
+                "It's unknown which of them to use. Rename or delete extra ones, or change 'calendar_name' in config"
+            )
+        if len(same_name_calendars) == 1:
+            print(f"Calendar '{name}' already exists")
+            br_calendar = same_name_calendars[0]
 
         calendar_prefs = {
             "summary": self.config.calendar_name,
@@ -117,45 +325,90 @@ class GoogleCalendarApi:
 
         if br_calendar is None:
             print(f"Creating calendar '{name}'...")
-            return self.service.calendars().insert(body=calendar_prefs).execute()
+            return self._insert_calendar(calendar_prefs)
         else:
             for k, v in calendar_prefs.items():
                 if br_calendar[k] != v:
                     print(f"Updating calendar '{name}'...")
                     br_calendar.update(calendar_prefs)
-                    return self.service.calendars().update(calendarId=br_calendar["id"], body=br_calendar).execute()
+                    return self._update_calendar(br_calendar)
         return br_calendar
 
-    def _get_all_events(self) -> list[dict]:
+    # only fields used by BirthdayEvent are requested, it makes responses several times smaller
+    _LIST_FIELDS = (
+        "items(id,etag,summary,description,start,end,recurrence,reminders,extendedProperties,status),"
+        "nextPageToken,nextSyncToken"
+    )
+    _LIST_PARAMS = dict(singleEvents=False, maxResults=2500, fields=_LIST_FIELDS)
+
+    def _list_events(self, params: dict) -> tuple[list[dict], str | None]:
+        """Requests all pages of events list. Returns events and the token for the next incremental sync"""
         events = []
         page_token = None
         while True:
             result = (
-                self.service.events()
-                .list(
-                    calendarId=self.br_calendar["id"],
-                    singleEvents=False,
-                    pageToken=page_token,
-                    maxResults=2500,
-                )
-                .execute()
+                self.service.events().list(calendarId=self.br_calendar["id"], pageToken=page_token, **params).execute()
             )
             events.extend(result.get("items", []))
 
             page_token = result.get("nextPageToken")
             if not page_token:
                 break
+        return events, result.get("nextSyncToken")
+
+    def _sync_events(self) -> list[dict]:
+        """Downloads only events changed since the previous run and merges them into the local snapshot"""
+        snapshot = EventsSnapshot(self.config.cache_dir, self.br_calendar["id"])
 
-        # although we set cancelledEvents=False, we still can get cancelled events
+        if snapshot.sync_token is not None:
+            try:
+                # deleted events are needed to update the snapshot, so showDeleted is not set
+                changed_events, sync_token = self._list_events(dict(self._LIST_PARAMS, syncToken=snapshot.sync_token))
+                snapshot.merge(changed_events, sync_token)
+                if self.config.verbose:
+                    print(f"Downloaded {len(changed_events)} changed events")
+            except Exception as e:
+                # Google invalidates sync tokens from time to time, then full sync is required
+                if not self._is_gone_error(e):
+                    raise
+                print("Sync token is no longer valid, downloading all events...")
+                snapshot.sync_token = None
+
+        if snapshot.sync_token is None:
+            events, sync_token = self._list_events(dict(self._LIST_PARAMS, showDeleted=False))
+            snapshot.reset(events, sync_token)
+
+        snapshot.save()
+        return list(snapshot.events.values())
+
+    def _get_all_events(self) -> list[dict]:
+        if self.config.use_incremental_sync:
+            events = self._sync_events()
+        else:
+            events, _ = self._list_events(dict(self._LIST_PARAMS, showDeleted=False))
+
+        # although we set showDeleted=False, we still can get cancelled events
         # if they are exceptions of a recurring event.
         # In our app user is not expected to modify any events manually, but he can.
         events = list(filter(lambda event: event["status"] != "cancelled", events))
 
         return events
 
+    @staticmethod
+    def _is_not_found_error(e: Exception) -> bool:
+        return isinstance(e, HttpError) and e.resp.status == 404
+
     def get_events(self) -> list[BirthdayEvent]:
         events = []
-        google_events = self._get_all_events()
+        try:
+            google_events = self._get_all_events()
+        except Exception as e:
+            if not (self._br_calendar_is_cached and self._is_not_found_error(e)):
+                raise
+            print(f"Calendar '{self.config.calendar_name}' from cache is not found, looking for it again...")
+            self._calendar_id_cache.remove(self.config.calendar_name)
+            self.br_calendar = self._create_br_calendar_if_not_exist()
+            google_events = self._get_all_events()
 
         for google_event in google_events:
             events.append(BirthdayEvent.from_google_event(google_event))
@@ -165,72 +418,274 @@ class GoogleCalendarApi:
     class EventActions(enum.Enum):
         CREATE = enum.auto()
         UPDATE = enum.auto()
+        PATCH = enum.auto()  # event contains only changed fields, see BirthdayEvent.google_event_patch
         DELETE = enum.auto()
 
-    def _process_one_event(self, google_event: dict, action: EventActions):
-        delays = [1, 2, 4, 8, 16, 32, 64, 128]
+    @enum.unique
+    class EventStatuses(enum.Enum):
+        DONE = enum.auto()
+        GONE = enum.auto()  # event was already deleted, see _is_gone_error
+        EXISTS = enum.auto()  # event with this id was already created, see _is_conflict_error
+
+    @dataclass
+    class EventOutcome:
+        google_event: dict  # event as it was sent to Google
+        status: "GoogleCalendarApi.EventStatuses"
+        response: dict | None = None  # event as it was returned by Google. None for deleted events
+
+    _DELAYS = [1, 2, 4, 8, 16, 32, 64, 128]
+    _MAX_BATCH_SIZE = 50  # Google Calendar API doesn't accept more calls in a single batch request
+
+    def _make_request(self, google_event: dict, action: EventActions):
+        match action:
+            case self.EventActions.CREATE:
+                return self.service.events().insert(calendarId=self.br_calendar["id"], body=google_event)
+            case self.EventActions.UPDATE:
+                return self.service.events().update(
+                    calendarId=self.br_calendar["id"], eventId=google_event["id"], body=google_event
+                )
+            case self.EventActions.PATCH:
+                return self.service.events().patch(
+                    calendarId=self.br_calendar["id"], eventId=google_event["id"], body=self._request_body(google_event)
+                )
+            case self.EventActions.DELETE:
+                return self.service.events().delete(calendarId=self.br_calendar["id"], eventId=google_event["id"])
+        raise ValueError(f"Unknown action: {action}")
+
+    @staticmethod
+    def _request_body(google_event: dict) -> dict:
+        """Body of patch request: id is already in the path"""
+        return {k: v for k, v in google_event.items() if k != "id"}
+
+    def _count_bytes_sent(self, google_events: list[dict], action: EventActions):
+        """Adds size of JSON bodies to 'bytes_sent'. Retries and HTTP overhead are not counted"""
+        if action == self.EventActions.DELETE:
+            return
+        if action == self.EventActions.PATCH:
+            google_events = [self._request_body(google_event) for google_event in google_events]
+        self.bytes_sent += sum(len(json.dumps(google_event).encode("utf-8")) for google_event in google_events)
+
+    @staticmethod
+    def _is_gone_error(e: Exception) -> bool:
+        # if user creates exception from recurring event, it will cause 410 error
+        # if exception event will be deleted after base event
+        return isinstance(e, HttpError) and e.resp.status == 410
+
+    @staticmethod
+    def _is_conflict_error(e: Exception) -> bool:
+        # event with id set by the program is created again, when request is repeated after its response was lost
+        return isinstance(e, HttpError) and e.resp.status == 409
+
+    @staticmethod
+    def _is_rate_limit_error(e: Exception) -> bool:
+        # Google responds with 403 "rateLimitExceeded" or 429 "Too Many Requests" when quota is exceeded
+        return isinstance(e, HttpError) and e.resp.status in [403, 429]
+
+    @staticmethod
+    def _report_gone(google_event: dict):
+        print(
+            f"Event has been deleted. Probably exception from a recurring event. "
+            f"Ignoring this error.\n{google_event=}"
+        )
+
+    def _outcome_of_error(self, e: Exception, google_event: dict, action: EventActions) -> EventOutcome | None:
+        """Outcome for errors that mean there is nothing to do, None for real errors"""
+        if self._is_gone_error(e):
+            self._report_gone(google_event)
+            return self.EventOutcome(google_event, self.EventStatuses.GONE)
+        if action == self.EventActions.CREATE and self._is_conflict_error(e):
+            return self.EventOutcome(google_event, self.EventStatuses.EXISTS)
+        return None
+
+    def _get_http(self):
+        """httplib2 is not thread-safe, so each worker thread gets its own connection"""
+        if self._http is not None:
+            return self._http
+        if not hasattr(self._thread_local, "http"):
+            self._thread_local.http = AuthorizedHttp(self._creds, http=build_http())
+        return self._thread_local.http
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.config.workers)
+        return self._executor
+
+    def _wait_before_retry(self, n: int, e: Exception, what: str):
+        if self._is_rate_limit_error(e):
+            delay = self._rate_limiter.back_off()
+            print(f"{what} failed with {e}, pausing all requests for {delay:.0f} seconds...")
+        else:
+            print(f"{what} failed with {e}, retrying in {self._DELAYS[n]} seconds...")
+            time.sleep(self._DELAYS[n])
+
+    def _process_one_event(self, google_event: dict, action: EventActions) -> EventOutcome:
+        delays = self._DELAYS
 
         for n in range(len(delays)):
             try:
-                match action:
-                    case self.EventActions.CREATE:
-                        self.service.events().insert(calendarId=self.br_calendar["id"], body=google_event).execute()
-                    case self.EventActions.UPDATE:
-                        self.service.events().update(
-                            calendarId=self.br_calendar["id"], eventId=google_event["id"], body=google_event
-                        ).execute()
-                    case self.EventActions.DELETE:
-                        self.service.events().delete(
-                            calendarId=self.br_calendar["id"], eventId=google_event["id"]
-                        ).execute()
-                break
+                self._rate_limiter.acquire()
+                response = self._make_request(google_event, action).execute(http=self._get_http())
+                self._rate_limiter.report_success()
+                return self.EventOutcome(google_event, self.EventStatuses.DONE, response or None)
             except Exception as e:
-                # if user creates exception from recurring event, it will cause 410 error
-                # if exception event will be deleted after base event
-                if type(e) is HttpError and e.resp.status == 410:
-                    print(
-                        f"Event has been deleted. Probably exception from a recurring event. "
-                        f"Ignoring this error.\n{google_event=}"
-                    )
-                    break
+                outcome = self._outcome_of_error(e, google_event, action)
+                if outcome is not None:
+                    return outcome
 
                 if n == len(delays) - 1:
-                    raise Exception(f"Request failed with {e}\nFailed to delete event! {google_event=}")
-                print(f"Request failed with {e}, retrying in {delays[n]} seconds...")
-                time.sleep(delays[n])
-
-    def _create_one_event(self, google_event: dict):
-        self._process_one_event(google_event, self.EventActions.CREATE)
-
-    def _update_one_event(self, google_event: dict):
-        self._process_one_event(google_event, self.EventActions.UPDATE)
-
-    def _delete_one_event(self, google_event: dict):
-        self._process_one_event(google_event, self.EventActions.DELETE)
-
-    def create_events(self, file_events: Iterable[BirthdayEvent]):
-        for event in tqdm.tqdm(file_events, desc="Creating events in Google Calendar"):
-            self._create_one_event(event.to_google_event())
-
-    def update_events(self, file_events: list[BirthdayEvent], google_events: list[BirthdayEvent]):
-        assert all(
-            BirthdayEventSignature.from_event(file_events[i]) == BirthdayEventSignature.from_event(google_events[i])
-            for i in range(len(file_events))
+                    raise Exception(f"Request failed with {e}\nFailed to {action.name.lower()} event! {google_event=}")
+                self._wait_before_retry(n, e, "Request")
+        assert False, "Unreachable code"
+
+    def _process_batch(self, google_events: list[dict], action: EventActions) -> dict[int, EventOutcome | Exception]:
+        """Sends events in one batch request. Returns outcome or error for each event index"""
+        results: dict[int, GoogleCalendarApi.EventOutcome | Exception] = {}
+
+        def callback(request_id, response, exception):
+            idx = int(request_id)
+            if exception is None:
+                results[idx] = self.EventOutcome(google_events[idx], self.EventStatuses.DONE, response or None)
+            else:
+                results[idx] = self._outcome_of_error(exception, google_events[idx], action) or exception
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for idx, google_event in enumerate(google_events):
+            batch.add(self._make_request(google_event, action), request_id=str(idx))
+        try:
+            batch.execute(http=self._get_http())
+        except Exception as e:
+            # the whole batch failed, so every sub-request has to be retried
+            for idx in range(len(google_events)):
+                results.setdefault(idx, e)
+        return results
+
+    def _process_events_batch(self, google_events: list[dict], action: EventActions) -> list[EventOutcome]:
+        """Sends events in batch request. Only failed sub-requests are retried, with exponential backoff"""
+        delays = self._DELAYS
+        outcomes: list[GoogleCalendarApi.EventOutcome | None] = [None] * len(google_events)
+
+        pending = list(range(len(google_events)))
+        for n in range(len(delays)):
+            # quota is counted per sub-request, not per batch
+            self._rate_limiter.acquire(len(pending))
+            results = self._process_batch([google_events[idx] for idx in pending], action)
+
+            failed: dict[int, Exception] = {}
+            for pending_idx, result in results.items():
+                if isinstance(result, Exception):
+                    failed[pending[pending_idx]] = result
+                else:
+                    outcomes[pending[pending_idx]] = result
+
+            if len(failed) == 0:
+                self._rate_limiter.report_success()
+                break
+            pending = sorted(failed)
+
+            # one rate limited sub-request is enough to pause all requests, whatever the others failed with
+            e = next((e for e in failed.values() if self._is_rate_limit_error(e)), failed[pending[0]])
+            if n == len(delays) - 1:
+                raise Exception(
+                    f"Request failed with {e}\nFailed to {action.name.lower()} {len(pending)} events! "
+                    f"First failed event: {google_events[pending[0]]}"
+                )
+            self._wait_before_retry(n, e, f"{len(pending)} requests in batch")
+
+        return outcomes  # type: ignore # all outcomes are set when loop is over without exception
+
+    def _process_events(
+        self,
+        google_events: list[dict],
+        action: EventActions,
+        desc: str,
+        on_done: Callable | None = None,
+        on_sent: Callable | None = None,
+    ) -> list[EventOutcome]:
+        """Processes events one by one or in batches, in the current thread or in the pool of workers.
+        'on_sent' is called with events of every chunk right before it's sent, and 'on_done' with outcomes
+        of every processed chunk. Both may be called from a worker thread"""
+        if self.config.use_batch_requests:
+            size = self._MAX_BATCH_SIZE
+            chunks = [google_events[start : start + size] for start in range(0, len(google_events), size)]
+        else:
+            chunks = [[google_event] for google_event in google_events]
+
+        with tqdm.tqdm(total=len(google_events), desc=desc) as pbar:
+
+            def process_chunk(chunk: list[dict]) -> list[GoogleCalendarApi.EventOutcome]:
+                if on_sent is not None:
+                    on_sent(chunk)
+                if self.config.use_batch_requests:
+                    chunk_outcomes = self._process_events_batch(chunk, action)
+                else:
+                    chunk_outcomes = [self._process_one_event(chunk[0], action)]
+                pbar.update(len(chunk))
+                if on_done is not None:
+                    on_done(chunk_outcomes)
+                return chunk_outcomes
+
+            if self.config.workers > 1:
+                # map() returns results in order of chunks and cancels the rest if one of them fails
+                results = list(self._get_executor().map(process_chunk, chunks))
+            else:
+                results = [process_chunk(chunk) for chunk in chunks]
+
+        return [outcome for chunk_outcomes in results for outcome in chunk_outcomes]
+
+    _ACTION_DESCRIPTIONS = {
+        EventActions.CREATE: "Creating events in Google Calendar",
+        EventActions.UPDATE: "Updating events in Google Calendar",
+        EventActions.PATCH: "Updating events in Google Calendar",
+        EventActions.DELETE: "Deleting events from Google Calendar",
+    }
+
+    def send_events(
+        self,
+        google_events: list[dict],
+        action: EventActions,
+        on_done: Callable | None = None,
+        on_sent: Callable | None = None,
+    ) -> list[EventOutcome]:
+        """Sends prepared bodies of requests. Bodies of all actions but CREATE must contain event id.
+        'on_sent' and 'on_done' are called for every request or batch, see _process_events"""
+        self._count_bytes_sent(google_events, action)
+        return self._process_events(google_events, action, self._ACTION_DESCRIPTIONS[action], on_done, on_sent)
+
+    def _sends_batches(self) -> bool:
+        return self.config.use_batch_requests
+
+    def estimate_cost(self, operation_counts: dict[str, int]) -> dict:
+        """Expected cost of sending requests, by names of EventActions. Every API call counts towards quota,
+        even if it's sent in a batch, and API calls are sent not faster than 'qps'"""
+        api_calls = sum(operation_counts.values())
+        http_requests = api_calls
+        if self._sends_batches():
+            http_requests = sum(math.ceil(n / self._MAX_BATCH_SIZE) for n in operation_counts.values())
+        return dict(api_calls=api_calls, http_requests=http_requests, seconds=round(api_calls / self.config.qps, 1))
+
+    def create_events(self, file_events: Iterable[BirthdayEvent]) -> list[EventOutcome]:
+        return self.send_events([event.to_google_event() for event in file_events], self.EventActions.CREATE)
+
+    def update_events(self, file_events: list[BirthdayEvent], google_events: list[BirthdayEvent]) -> list[EventOutcome]:
+        assert len(file_events) == len(google_events) and all(
+            file_event._signature == google_event._signature
+            for file_event, google_event in zip(file_events, google_events)
         ), "Expected list of corresponding events"
 
-        new_events = []
-        for idx in range(len(file_events)):
-            new_event = file_events[idx].to_google_event()
-            new_event["id"] = google_events[idx].google_event["id"]  # type: ignore # raising exception if None is ok
-            new_events.append(new_event)
+        # only changed fields are sent: after a config change it's usually just reminders
+        patches = []
+        for file_event, google_event in zip(file_events, google_events):
+            patch = file_event.google_event_patch(google_event)
+            patch["id"] = google_event.google_event["id"]  # type: ignore # see assert in google_event_patch
+            patches.append(patch)
 
-        for new_event in tqdm.tqdm(new_events, desc="Updating events in Google Calendar"):
-            self._update_one_event(new_event)
+        return self.send_events(patches, self.EventActions.PATCH)
 
-    def delete_events(self, google_events: Iterable[BirthdayEvent]):
+    def delete_events(self, google_events: Iterable[BirthdayEvent]) -> list[EventOutcome]:
+        google_events = list(google_events)
         assert all(
             event.google_event is not None for event in google_events
         ), "All events must have 'google_event' attribute"
 
-        for event in tqdm.tqdm(google_events, desc="Deleting events from Google Calendar"):
-            self._delete_one_event(event.google_event)  # type: ignore # mypy doesn't see assert above
+        old_events: list[dict] = [event.google_event for event in google_events]  # type: ignore # see assert above
+        return self.send_events(old_events, self.EventActions.DELETE)
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import urllib.parse
+from typing import Callable
+
+import aiohttp
+import tqdm
+from google.auth.transport.requests import Request
+
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.google_calendar_api import GoogleApiAuth, GoogleCalendarApi
+
+
+class AsyncApiError(Exception):
+    def __init__(self, status: int, content: str, method: str, url: str):
+        super().__init__(f"<HttpError {status} when requesting {method} {url} returned {content!r}>")
+        self.status = status
+        self.content = content
+
+
+class AsyncGoogleCalendarApi(GoogleCalendarApi):
+    """Alternative to GoogleCalendarApi that talks to Google Calendar REST API with aiohttp.
+
+    Events are listed and modified through a pool of keep-alive connections, mutations run
+    concurrently (up to config.workers at a time). Batch requests are not used by this driver.
+    """
+
+    _BASE_URL = "https://www.googleapis.com/calendar/v3"
+    _KEEPALIVE_TIMEOUT_S = 60
+
+    def __init__(self, config: MainConfig, base_url: str = _BASE_URL, token: str | None = None):
+        """If 'token' is provided, it is used instead of authorization. Useful for tests"""
+        self.base_url = base_url.rstrip("/")
+        self._token = token
+        super().__init__(config)
+
+    def _connect(self):
+        """Authorizes, unless the token is provided. Requests are made by aiohttp, see _run"""
+        if self._token is None:
+            self._creds = GoogleApiAuth(self.config.google_oauth_port).creds
+            self._token = self._creds.token
+
+    # --- transport ---
+
+    def _run(self, request_fn):
+        """Runs 'request_fn(session)' in a new event loop. All its requests share the pool of connections"""
+
+        async def run():
+            connector = aiohttp.TCPConnector(limit=self.config.workers, keepalive_timeout=self._KEEPALIVE_TIMEOUT_S)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                return await request_fn(session)
+
+        return asyncio.run(run())
+
+    async def _request(self, session, method: str, path: str, params: dict | None = None, body: dict | None = None):
+        url = self.base_url + path
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {self._token}"}
+            async with session.request(method, url, params=params, json=body, headers=headers) as resp:
+                content = await resp.text()
+                if resp.status == 401 and attempt == 0 and self._creds is not None:
+                    # token expired during a long run
+                    self._creds.refresh(Request())
+                    self._token = self._creds.token
+                    continue
+                if resp.status >= 300:
+                    raise AsyncApiError(resp.status, content, method, url)
+                return json.loads(content) if content else None
+        assert False, "Unreachable code"
+
+    @staticmethod
+    def _is_gone_error(e: Exception) -> bool:
+        return isinstance(e, AsyncApiError) and e.status == 410
+
+    @staticmethod
+    def _is_not_found_error(e: Exception) -> bool:
+        return isinstance(e, AsyncApiError) and e.status == 404
+
+    @staticmethod
+    def _is_conflict_error(e: Exception) -> bool:
+        return isinstance(e, AsyncApiError) and e.status == 409
+
+    @staticmethod
+    def _is_rate_limit_error(e: Exception) -> bool:
+        return isinstance(e, AsyncApiError) and e.status in [403, 429]
+
+    @staticmethod
+    def _params_to_query(params: dict) -> dict:
+        return {k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in params.items() if v is not None}
+
+    def _events_path(self, event_id: str | None = None) -> str:
+        path = f"/calendars/{urllib.parse.quote(self.br_calendar['id'])}/events"
+        if event_id is not None:
+            path += f"/{urllib.parse.quote(event_id)}"
+        return path
+
+    # --- calendars ---
+
+    def _get_calendars(self, params: dict) -> dict:
+        query = self._params_to_query(params)
+        return self._run(lambda session: self._request(session, "GET", "/users/me/calendarList", params=query))
+
+    def _insert_calendar(self, calendar_prefs: dict) -> dict:
+        return self._run(lambda session: self._request(session, "POST", "/calendars", body=calendar_prefs))
+
+    def _update_calendar(self, calendar: dict) -> dict:
+        path = f"/calendars/{urllib.parse.quote(calendar['id'])}"
+        return self._run(lambda session: self._request(session, "PUT", path, body=calendar))
+
+    def _get_calendar(self, calendar_id: str) -> dict:
+        path = f"/calendars/{urllib.parse.quote(calendar_id)}"
+        return self._run(lambda session: self._request(session, "GET", path))
+
+    def _delete_calendar(self, calendar_id: str):
+        path = f"/calendars/{urllib.parse.quote(calendar_id)}"
+        self._run(lambda session: self._request(session, "DELETE", path))
+
+    def _get_calendar_list_entry(self, calendar_id: str) -> dict:
+        path = f"/users/me/calendarList/{urllib.parse.quote(calendar_id)}"
+        return self._run(lambda session: self._request(session, "GET", path))
+
+    def _patch_calendar_list_entry(self, calendar_id: str, entry: dict) -> dict:
+        path = f"/users/me/calendarList/{urllib.parse.quote(calendar_id)}"
+        return self._run(lambda session: self._request(session, "PATCH", path, body=entry))
+
+    # --- events ---
+
+    def _list_events(self, params: dict) -> tuple[list[dict], str | None]:
+        async def list_all_pages(session):
+            events = []
+            page_token = None
+            while True:
+                query = self._params_to_query(dict(params, pageToken=page_token))
+                result = await self._request(session, "GET", self._events_path(), params=query)
+                events.extend(result.get("items", []))
+
+                page_token = result.get("nextPageToken")
+                if not page_token:
+                    break
+            return events, result.get("nextSyncToken")
+
+        return self._run(list_all_pages)
+
+    async def _process_one_event_async(
+        self, session, google_event: dict, action: GoogleCalendarApi.EventActions
+    ) -> GoogleCalendarApi.EventOutcome:
+        delays = self._DELAYS
+
+        for n in range(len(delays)):
+            try:
+                await asyncio.sleep(self._rate_limiter.reserve())
+                match action:
+                    case self.EventActions.CREATE:
+                        response = await self._request(session, "POST", self._events_path(), body=google_event)
+                    case self.EventActions.UPDATE:
+                        path = self._events_path(google_event["id"])
+                        response = await self._request(session, "PUT", path, body=google_event)
+                    case self.EventActions.PATCH:
+                        path = self._events_path(google_event["id"])
+                        response = await self._request(session, "PATCH", path, body=self._request_body(google_event))
+                    case self.EventActions.DELETE:
+                        response = await self._request(session, "DELETE", self._events_path(google_event["id"]))
+                self._rate_limiter.report_success()
+                return self.EventOutcome(google_event, self.EventStatuses.DONE, response or None)
+            except Exception as e:
+                outcome = self._outcome_of_error(e, google_event, action)
+                if outcome is not None:
+                    return outcome
+
+                if n == len(delays) - 1:
+                    raise Exception(f"Request failed with {e}\nFailed to {action.name.lower()} event! {google_event=}")
+                if self._is_rate_limit_error(e):
+                    delay = self._rate_limiter.back_off()
+                    print(f"Request failed with {e}, pausing all requests for {delay:.0f} seconds...")
+                else:
+                    print(f"Request failed with {e}, retrying in {delays[n]} seconds...")
+                    await asyncio.sleep(delays[n])
+        assert False, "Unreachable code"
+
+    def _sends_batches(self) -> bool:
+        return False  # see use_async_driver in config
+
+    def _process_events(
+        self,
+        google_events: list[dict],
+        action: GoogleCalendarApi.EventActions,
+        desc: str,
+        on_done: Callable | None = None,
+        on_sent: Callable | None = None,
+    ) -> list[GoogleCalendarApi.EventOutcome]:
+        async def process_all(session):
+            semaphore = asyncio.Semaphore(self.config.workers)
+
+            with tqdm.tqdm(total=len(google_events), desc=desc) as pbar:
+
+                async def process(google_event: dict):
+                    async with semaphore:
+                        if on_sent is not None:
+                            on_sent([google_event])
+                        outcome = await self._process_one_event_async(session, google_event, action)
+                    pbar.update()
+                    if on_done is not None:
+                        on_done([outcome])
+                    return outcome
+
+                return await asyncio.gather(*[process(google_event) for google_event in google_events])
+
+        return self._run(process_all)
@@ -0,0 +1,292 @@
+import glob
+import hashlib
+import json
+import os.path
+import threading
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable
+
+from birthday_reminder.birthday_event import BirthdayEvent, BirthdayEventSignature, ComparisonResult
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.utils.json_file import load_json, save_json
+
+if TYPE_CHECKING:
+    from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+
+
+class UploadJournal:
+    """Remembers what the last successful upload put into Google Calendar.
+
+    For every event it stores signature, content hash, Google event id and etag. This is enough
+    to find out what changed in file since then, without downloading events from Google.
+    The journal is valid only as long as nobody edits the calendar manually. Google changes etag of edited events,
+    so events listed from Google with the recorded etag are compared by the hash written on upload.
+    Journals are kept per input file, so modifying the calendar invalidates journals of all files uploaded to it.
+    """
+
+    _DATE_FORMAT = "%Y-%m-%d"
+    _PREFIX = "upload_journal"
+    _EXTENSION = "json"
+
+    def __init__(self, config: MainConfig, calendar_id: str):
+        self.file_path = self.state_file_path(config, self._PREFIX, self._EXTENSION)
+        self._cache_dir = config.cache_dir
+        self.calendar_id = calendar_id
+
+        data = load_json(self.file_path, default={})
+        # [date, has_year, display_title, content_hash, google_event_id, etag]. etag is None, if it's unknown
+        self._entries: list[list] = data.get("events", [])
+        self.is_valid = data.get("calendar_id") == calendar_id
+
+    @staticmethod
+    def state_file_path(config: MainConfig, prefix: str, extension: str) -> str:
+        """Path of a file in cache_dir, that keeps state of uploads from input file to the calendar"""
+        state_hash = hashlib.sha1(f"{os.path.abspath(config.input_file)}|{config.calendar_name}".encode("utf-8"))
+        return os.path.join(config.cache_dir, f"{prefix}_{state_hash.hexdigest()[:16]}.{extension}")
+
+    @classmethod
+    def entry(cls, event: BirthdayEvent, google_event_id: str, etag: str | None) -> list:
+        return [
+            event.date.strftime(cls._DATE_FORMAT),
+            event.has_year,
+            event.display_title,
+            event.content_hash,
+            google_event_id,
+            etag,
+        ]
+
+    @property
+    def google_events(self) -> list[BirthdayEvent]:
+        """Events as they should be in Google Calendar. Only id, summary and etag are known about them"""
+        return [
+            BirthdayEvent(
+                date=datetime.strptime(date_str, self._DATE_FORMAT),
+                title=display_title,
+                has_year=has_year,
+                google_event={"id": google_event_id, "summary": display_title, "etag": etag},
+            )
+            for date_str, has_year, display_title, _, google_event_id, etag in self._entries
+        ]
+
+    def trust_unchanged(self, google_events: Iterable[BirthdayEvent]):
+        """Lets events listed from Google, that are not edited since the last upload, be compared
+        by the content hash written on upload, see BirthdayEvent.trust_stored_content_hash"""
+        if not self.is_valid:
+            return
+        etags = {google_event_id: etag for *_, google_event_id, etag in self._entries if etag is not None}
+        for event in google_events:
+            google_event = event.google_event or {}
+            if google_event.get("etag") is not None and etags.get(google_event.get("id")) == google_event["etag"]:
+                event.trust_stored_content_hash()
+
+    def compare(self, file_events: Iterable[BirthdayEvent]) -> tuple[list[BirthdayEvent], ComparisonResult]:
+        """Compares file with journal, like compare_events_file_and_google does with Google Calendar.
+        Returns events from journal and comparison result"""
+        assert self.is_valid, "Journal doesn't match the calendar"
+
+        google_events = self.google_events
+        google_index = {event._signature: (event, entry[3]) for event, entry in zip(google_events, self._entries)}
+
+        cmp_result = ComparisonResult()
+        for event in file_events:
+            google_event, google_hash = google_index.pop(event._signature, (None, None))
+            if google_event is None:
+                cmp_result.events_to_create.append(event)
+                cmp_result.file_only_events.add(BirthdayEventSignature.from_event(event))
+            elif google_hash == event.content_hash:
+                cmp_result.equal_events.add(event)
+            else:
+                cmp_result.updated_pairs.append((event, google_event))
+                cmp_result.updated_events.add(BirthdayEventSignature.from_event(event))
+
+        for event in google_events:
+            if event._signature in google_index:
+                cmp_result.events_to_delete.append(event)
+                cmp_result.google_only_events.add(BirthdayEventSignature.from_event(event))
+        return google_events, cmp_result
+
+    def invalidate(self):
+        """Call before modifying the calendar: if upload fails halfway, journal must not be trusted.
+        Journals of other input files, uploaded to the same calendar, won't match it either"""
+        self.is_valid = False
+        self._entries = []
+        save_json(self.file_path, {})
+        for file_path in glob.glob(os.path.join(self._cache_dir, f"{self._PREFIX}_*.{self._EXTENSION}")):
+            if file_path != self.file_path and load_json(file_path, default={}).get("calendar_id") == self.calendar_id:
+                save_json(file_path, {})
+
+    def record(self, file_events: Iterable[BirthdayEvent], google_events: Iterable[BirthdayEvent]):
+        """Saves file events, when Google Calendar matches them. Ids and etags are taken from 'google_events'.
+        After upload, entries are saved by 'record_entries', see UploadCheckpoint"""
+        stored = {event._signature: event.google_event for event in google_events}
+
+        self.record_entries(
+            [
+                self.entry(event, stored[event._signature]["id"], stored[event._signature].get("etag"))  # type: ignore
+                for event in file_events
+            ]
+        )
+
+    def record_entries(self, entries: list[list]):
+        """Saves entries, made by 'entry', after successful upload"""
+        self._entries = entries
+        self.is_valid = True
+        save_json(self.file_path, dict(calendar_id=self.calendar_id, events=self._entries))
+
+
+class UploadCheckpoint:
+    """Plan of an upload and progress of its operations, that lets an interrupted upload continue.
+
+    The file starts with the plan: bodies of all requests and the journal entries, that the calendar
+    matches when all of them are done. Then a line is appended, when a request or a batch is about to be sent
+    (in flight) and when it is done, with etags of patched and created events. Requests that are neither sent
+    nor done are just planned.
+    Ids of created events are set by the plan, so an in-flight request can be sent again:
+    Google responds with 409 to a repeated create and with 410 to a repeated delete, and patch is idempotent.
+    """
+
+    _ACTIONS = ["DELETE", "PATCH", "CREATE"]  # in order of execution
+    _SENT = "sent"
+    _DONE = "done"
+
+    def __init__(self, config: MainConfig, calendar_id: str):
+        self.file_path = UploadJournal.state_file_path(config, "upload_checkpoint", "jsonl")
+        self.calendar_id = calendar_id
+        self.operations: dict[str, list[dict]] = {action: [] for action in self._ACTIONS}  # action -> request bodies
+        self.entries: list[list] = []  # see UploadJournal.entry
+        self.sent: set[str] = set()  # ids of events
+        self.done: set[str] = set()
+        self.etags: dict[str, str] = {}  # id -> etag, returned by Google for done requests
+        self._lock = threading.Lock()
+
+    @classmethod
+    def make(
+        cls,
+        config: MainConfig,
+        calendar_id: str,
+        file_events: Iterable[BirthdayEvent],
+        google_events: Iterable[BirthdayEvent],
+        cmp_result: ComparisonResult,
+    ) -> "UploadCheckpoint":
+        """Makes the plan of changes from 'cmp_result'. 'google_events' are events, that were
+        in the calendar before the upload, with ids. The plan is not saved until 'save' is called"""
+        checkpoint = cls(config, calendar_id)
+        google_ids = {event._signature: event.google_event["id"] for event in google_events}  # type: ignore
+        etags = {event._signature: event.google_event.get("etag") for event in google_events}  # type: ignore
+        for event in cmp_result.events_to_delete:
+            checkpoint.operations["DELETE"].append({"id": event.google_event["id"]})  # type: ignore
+        for file_event, google_event in cmp_result.updated_pairs:
+            patch = file_event.google_event_patch(google_event)
+            patch["id"] = google_event.google_event["id"]  # type: ignore
+            checkpoint.operations["PATCH"].append(patch)
+            etags[file_event._signature] = None  # patch changes etag, the new one is known when it's done
+        for event in cmp_result.events_to_create:
+            new_event = event.to_google_event()
+            new_event["id"] = uuid.uuid4().hex  # hex digits are valid in Google event ids
+            google_ids[event._signature] = new_event["id"]
+            checkpoint.operations["CREATE"].append(new_event)
+        checkpoint.entries = [
+            UploadJournal.entry(event, google_ids[event._signature], etags.get(event._signature))
+            for event in file_events
+        ]
+        return checkpoint
+
+    def to_dict(self) -> dict:
+        """The plan, without progress of its operations"""
+        return dict(calendar_id=self.calendar_id, operations=self.operations, entries=self.entries)
+
+    def save(self):
+        """Saves the plan as a checkpoint with nothing done, replacing the checkpoint of the previous upload"""
+        save_json(self.file_path, self.to_dict())
+
+    @classmethod
+    def from_plan_file(cls, config: MainConfig, calendar_id: str, file_path: str) -> "UploadCheckpoint":
+        """Reads the plan, saved by 'plan' command, see 'to_dict'"""
+        plan = load_json(file_path)
+        if not isinstance(plan, dict) or not {"calendar_id", "operations", "entries"} <= plan.keys():
+            raise Exception(f"File {file_path} is not a valid upload plan")
+        if plan["calendar_id"] != calendar_id:
+            raise Exception(
+                f"The plan is made for calendar {plan['calendar_id']}, but calendar '{config.calendar_name}' "
+                f"is {calendar_id}. Make a new plan"
+            )
+        checkpoint = cls(config, calendar_id)
+        checkpoint.operations = plan["operations"]
+        checkpoint.entries = plan["entries"]
+        return checkpoint
+
+    @classmethod
+    def load(cls, config: MainConfig, calendar_id: str) -> "UploadCheckpoint | None":
+        """Returns checkpoint of the interrupted upload to the calendar, or None if there is nothing to resume"""
+        checkpoint = cls(config, calendar_id)
+        try:
+            with open(checkpoint.file_path, encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            plan = json.loads(lines[0])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if plan.get("calendar_id") != calendar_id:
+            return None
+
+        checkpoint.operations = plan["operations"]
+        checkpoint.entries = plan["entries"]
+        for line in lines[1:]:
+            try:
+                state, event_ids, etags = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line is cut, if the program was killed while writing it
+            (checkpoint.sent if state == cls._SENT else checkpoint.done).update(event_ids)
+            checkpoint.etags.update(etags)
+        return checkpoint
+
+    @property
+    def n_operations(self) -> int:
+        return sum(len(bodies) for bodies in self.operations.values())
+
+    @property
+    def operation_counts(self) -> dict[str, int]:
+        return {action: len(bodies) for action, bodies in self.operations.items()}
+
+    @property
+    def n_in_flight(self) -> int:
+        return len(self.sent - self.done)
+
+    @property
+    def journal_entries(self) -> list[list]:
+        """Entries of the plan with etags of patched and created events, see UploadJournal.entry"""
+        return [[*entry[:5], self.etags.get(entry[4], entry[5])] for entry in self.entries]
+
+    def _append(self, f, state: str, event_ids: list[str], etags: dict[str, str]):
+        with self._lock:  # called from worker threads
+            f.write("\n" + json.dumps([state, event_ids, etags]))
+            f.flush()
+            (self.sent if state == self._SENT else self.done).update(event_ids)
+            self.etags.update(etags)
+
+    def run(self, gc_api: "GoogleCalendarApi"):
+        """Sends requests that are not done yet. Requests that were in flight are sent again"""
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            for action in self._ACTIONS:
+                bodies = [body for body in self.operations[action] if body["id"] not in self.done]
+                if len(bodies) == 0:
+                    continue
+
+                def on_sent(chunk: list[dict]):
+                    self._append(f, self._SENT, [body["id"] for body in chunk], {})
+
+                def on_done(outcomes: list):
+                    etags = {
+                        o.google_event["id"]: o.response["etag"]
+                        for o in outcomes
+                        if o.response and "etag" in o.response
+                    }
+                    self._append(f, self._DONE, [outcome.google_event["id"] for outcome in outcomes], etags)
+
+                gc_api.send_events(bodies, gc_api.EventActions[action], on_done=on_done, on_sent=on_sent)
+
+    def remove(self):
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,137 @@
+import struct
+from array import array
+from datetime import date as date_type
+from datetime import datetime
+from typing import Iterator, Optional, Sequence
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.utils.birthday_calendar import BirthdayCalendar, BirthdayIndex
+
+
+class EventStore(Sequence[BirthdayEvent]):
+    """Compact storage for many events from file, that share the same config.
+
+    Dates are kept in packed integer arrays and titles are interned, so an event takes
+    a dozen of bytes instead of a BirthdayEvent object with a datetime and a dict.
+    Indexing and iteration return BirthdayEvent views, created on demand.
+    """
+
+    __slots__ = (
+        "config",
+        "_years",
+        "_months",
+        "_days",
+        "_title_ids",
+        "_titles",
+        "_title_ids_by_title",
+        "_birthday_index",
+    )
+
+    _NO_YEAR = 0
+    _HEADER = struct.Struct("<II")  # number of events, number of titles
+
+    def __init__(self, config: MainConfig):
+        self.config = config
+        self._years = array("H")
+        self._months = array("B")
+        self._days = array("B")
+        self._title_ids = array("I")
+        self._titles: list[str] = []
+        self._title_ids_by_title: Optional[dict[str, int]] = {}  # None if not built yet, see 'from_bytes'
+        self._birthday_index: Optional[BirthdayIndex] = None
+
+    def append(self, date: datetime, title: str, has_year: bool):
+        if self._title_ids_by_title is None:
+            self._title_ids_by_title = {title: title_id for title_id, title in enumerate(self._titles)}
+        title_id = self._title_ids_by_title.get(title)
+        if title_id is None:
+            title_id = len(self._titles)
+            self._titles.append(title)
+            self._title_ids_by_title[title] = title_id
+
+        self._years.append(date.year if has_year else self._NO_YEAR)
+        self._months.append(date.month)
+        self._days.append(date.day)
+        self._title_ids.append(title_id)
+        self._birthday_index = None
+
+    def __len__(self) -> int:
+        return len(self._title_ids)
+
+    def _event(self, idx: int) -> BirthdayEvent:
+        year = self._years[idx]
+        has_year = year != self._NO_YEAR
+        date = datetime(year if has_year else BirthdayEvent._DEFAULT_YEAR, self._months[idx], self._days[idx])
+        return BirthdayEvent(date, self._titles[self._title_ids[idx]], has_year=has_year, config=self.config)
+
+    def __getitem__(self, idx):
+        """Returns a view of event with index 'idx', or list of views for a slice"""
+        if isinstance(idx, slice):
+            return [self._event(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("EventStore index out of range")
+        return self._event(idx)
+
+    def __iter__(self) -> Iterator[BirthdayEvent]:
+        for idx in range(len(self)):
+            yield self._event(idx)
+
+    def to_bytes(self) -> bytes:
+        """Binary image of the store, for the same machine: arrays are dumped in native byte order"""
+        titles = "\n".join(self._titles).encode("utf-8")  # titles come from lines of file, so have no newlines
+        return b"".join(
+            [
+                self._HEADER.pack(len(self), len(self._titles)),
+                self._years.tobytes(),
+                self._months.tobytes(),
+                self._days.tobytes(),
+                self._title_ids.tobytes(),
+                titles,
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, config: MainConfig, data, offset: int = 0) -> "EventStore":
+        """Restores store from result of 'to_bytes', that starts at 'offset' in 'data' (bytes, mmap etc.)"""
+        if offset + cls._HEADER.size > len(data):
+            raise ValueError("Corrupted event store")
+        n_events, n_titles = cls._HEADER.unpack_from(data, offset)
+        store = cls(config)
+        offset += cls._HEADER.size
+        for column in [store._years, store._months, store._days, store._title_ids]:
+            size = n_events * column.itemsize
+            if offset + size > len(data):
+                raise ValueError("Corrupted event store")
+            column.frombytes(data[offset : offset + size])
+            offset += size
+        store._titles = str(data[offset:], "utf-8").split("\n") if n_titles else []
+        if len(store._titles) != n_titles:
+            raise ValueError("Corrupted event store")
+        store._title_ids_by_title = None  # only needed to append, so it's built on demand
+        return store
+
+    def sort_keys(self, sort_type: str) -> array:
+        """Like BirthdayEvent.sort_keys, but computed right from the arrays, without views"""
+        birthday_calendar = BirthdayCalendar.get(self.config.remind_29_feb_on_1_mar)
+        return birthday_calendar.sort_keys(self._years, self._months, self._days, sort_type)
+
+    def upcoming(self, n_days: int) -> list[tuple[date_type, BirthdayEvent]]:
+        """Birthdays from today to 'n_days' days later, inclusive, in order of date.
+
+        Uses day of year index, built on the first call, so later calls cost O(matches) regardless of store size
+        """
+        if self._birthday_index is None:
+            self._birthday_index = BirthdayIndex(self._months, self._days)
+        birthday_calendar = BirthdayCalendar.get(self.config.remind_29_feb_on_1_mar)
+        return [(date, self._event(idx)) for date, idx in self._birthday_index.upcoming(birthday_calendar, n_days)]
+
+    def _keys(self) -> Iterator[int]:
+        """Packs every event into an int. Events of one store are equal if and only if their keys are equal"""
+        for year, month, day, title_id in zip(self._years, self._months, self._days, self._title_ids):
+            yield title_id << 23 | year << 9 | month << 5 | day
+
+    def has_duplicates(self) -> bool:
+        return len(set(self._keys())) != len(self)
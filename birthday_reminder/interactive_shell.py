@@ -1,9 +1,11 @@
+import multiprocessing
 import traceback
 
 from birthday_reminder.app import main
 from birthday_reminder.utils.colorize import Colorize
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # see __main__.py
     print(
         Colorize.info(
             "Welcome to the Birthday Reminder Interactive Shell!\n"
@@ -0,0 +1,228 @@
+import calendar
+import contextlib
+import contextvars
+import functools
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterator, Sequence
+
+_reference_time: contextvars.ContextVar[datetime | None] = contextvars.ContextVar("reference_time", default=None)
+
+
+def now() -> datetime:
+    """Current time for all date math. Inside 'reference_time' block it doesn't change"""
+    return _reference_time.get() or datetime.now()
+
+
+@contextlib.contextmanager
+def reference_time(time: datetime | None = None) -> Iterator[datetime]:
+    """Fixes the result of 'now' inside the block, by default to the time of entering it.
+
+    Then all ages and days until birthdays are computed for the same day, even if the run crosses midnight.
+    Nested blocks without 'time' keep the time of the outer one.
+    """
+    token = _reference_time.set(time or now())
+    try:
+        yield now()
+    finally:
+        _reference_time.reset(token)
+
+
+ZODIAC_SIGNS = [
+    (("Capricorn", "♑"), (1, 19)),
+    (("Aquarius", "♒"), (2, 18)),
+    (("Pisces", "♓"), (3, 20)),
+    (("Aries", "♈"), (4, 19)),
+    (("Taurus", "♉"), (5, 20)),
+    (("Gemini", "♊"), (6, 20)),
+    (("Cancer", "♋"), (7, 22)),
+    (("Leo", "♌"), (8, 22)),
+    (("Virgo", "♍"), (9, 22)),
+    (("Libra", "♎"), (10, 22)),
+    (("Scorpio", "♏"), (11, 21)),
+    (("Sagittarius", "♐"), (12, 21)),
+    (("Capricorn", "♑"), (12, 31)),  # to handle the case of dates after Dec 21
+]
+
+_LEAP_YEAR = 1904
+# day of year (from 0) of the first day of every month in a leap year, months are counted from 1
+_MONTH_OFFSETS = [0] + [date(_LEAP_YEAR, month, 1).timetuple().tm_yday - 1 for month in range(1, 13)]
+
+
+def day_of_year(month: int, day: int) -> int:
+    """Day of year in a leap year, from 0 to 365. Feb 29 is 59"""
+    return _MONTH_OFFSETS[month] + day - 1
+
+
+def _zodiac_index(month: int, day: int) -> int:
+    for idx, (_, last_day) in enumerate(ZODIAC_SIGNS):
+        if (month, day) <= last_day:
+            return idx
+    raise Exception("Date is invalid. That's weird. Shouldn't get here")
+
+
+# tables are built on first use, so that commands that don't need them start faster
+@functools.cache
+def _dates_of_leap_year() -> list[date]:
+    return [date(_LEAP_YEAR, 1, 1) + timedelta(days=idx) for idx in range(366)]
+
+
+@functools.cache
+def _zodiac_indices() -> array:
+    return array("B", [_zodiac_index(d.month, d.day) for d in _dates_of_leap_year()])
+
+
+def zodiac_index(month: int, day: int) -> int:
+    """Index of zodiac sign in ZODIAC_SIGNS"""
+    return _zodiac_indices()[day_of_year(month, day)]
+
+
+@dataclass
+class BirthdayStats:
+    """Values for many birthdays at once, in the same order as the input arrays"""
+
+    ages: array
+    days_until_next_birthday: array
+    zodiac_indices: array
+
+
+class BirthdayCalendar:
+    """Date math of birthdays relative to one reference date.
+
+    Everything but age depends only on month and day of birth, so values are precomputed for each of
+    366 days of a leap year. After that any number of birthdays is processed with table lookups.
+
+    In non-leap years Feb 29 birthdays are celebrated on Mar 1 if 'remind_29_feb_on_1_mar', else on Feb 28.
+    The birthday is "next" if it's after the reference date: on the birthday itself, the next one is in a year.
+    """
+
+    def __init__(self, today: date, remind_29_feb_on_1_mar: bool):
+        self.today = today
+        self.remind_29_feb_on_1_mar = remind_29_feb_on_1_mar
+
+        self._days_until = array("H")
+        self._passed = array("B")  # 1 if the birthday this year is today or before
+        for d in _dates_of_leap_year():
+            this_year = self._birthday_in_year(d.month, d.day, today.year)
+            self._passed.append(this_year <= today)
+            if this_year > today:
+                self._days_until.append((this_year - today).days)
+            else:
+                self._days_until.append((self._birthday_in_year(d.month, d.day, today.year + 1) - today).days)
+
+    @classmethod
+    def get(cls, remind_29_feb_on_1_mar: bool, today: date | None = None) -> "BirthdayCalendar":
+        """Cached instance for 'today' (by default, the date of 'now'), so that tables are built once per day"""
+        return cls._get(today or now().date(), remind_29_feb_on_1_mar)
+
+    @classmethod
+    @functools.lru_cache(maxsize=16)
+    def _get(cls, today: date, remind_29_feb_on_1_mar: bool) -> "BirthdayCalendar":
+        return cls(today, remind_29_feb_on_1_mar)
+
+    def _birthday_in_year(self, month: int, day: int, year: int) -> date:
+        if month == 2 and day == 29 and not calendar.isleap(year):
+            return date(year, 3, 1) if self.remind_29_feb_on_1_mar else date(year, 2, 28)
+        return date(year, month, day)
+
+    def age(self, year: int, month: int, day: int) -> int:
+        return self.today.year - year - (not self._passed[day_of_year(month, day)])
+
+    def days_until_next_birthday(self, month: int, day: int) -> int:
+        return self._days_until[day_of_year(month, day)]
+
+    def next_birthday(self, month: int, day: int) -> date:
+        return self.today + timedelta(days=self.days_until_next_birthday(month, day))
+
+    def is_birthday_today(self, month: int, day: int) -> bool:
+        return self._birthday_in_year(month, day, self.today.year) == self.today
+
+    def stats(self, years: Sequence[int], months: Sequence[int], days: Sequence[int]) -> BirthdayStats:
+        """Computes ages, days until next birthdays and zodiac indices for arrays of birth dates in one pass.
+
+        Ages of birthdays without year are meaningless, pass any year for them.
+        """
+        ages = array("i")
+        days_until = array("H")
+        zodiac_indices = array("B")
+        today_year = self.today.year
+        passed = self._passed
+        days_until_table = self._days_until
+        zodiac_table = _zodiac_indices()
+        for year, month, day in zip(years, months, days):
+            doy = _MONTH_OFFSETS[month] + day - 1
+            ages.append(today_year - year - (not passed[doy]))
+            days_until.append(days_until_table[doy])
+            zodiac_indices.append(zodiac_table[doy])
+        return BirthdayStats(ages, days_until, zodiac_indices)
+
+    def sort_keys(self, years: Sequence[int], months: Sequence[int], days: Sequence[int], sort_type: str) -> array:
+        """Integer sort key for every birth date. Year 0 means that the year is unknown.
+
+        - "year": dates with year by date, then dates without year by month and day
+        - "date": by month and day
+        - "next": by days until the next birthday
+        """
+        match sort_type:
+            case "year":
+                no_year_flag = 1 << 23  # years take 14 bits, month and day take 9 bits
+                return array(
+                    "L",
+                    [
+                        (year << 9 if year else no_year_flag) | month << 5 | day
+                        for year, month, day in zip(years, months, days)
+                    ],
+                )
+            case "date":
+                return array("L", [month << 5 | day for month, day in zip(months, days)])
+            case "next":
+                days_until = self._days_until
+                return array("L", [days_until[_MONTH_OFFSETS[month] + day - 1] for month, day in zip(months, days)])
+            case _:
+                raise ValueError(f"Unknown sort type: {sort_type}")
+
+
+class BirthdayIndex:
+    """Indices of birthdays in 366 buckets, one for each day of a leap year.
+
+    Birthdays in a range of days are found by walking the buckets of the range. It takes at most
+    a year of buckets plus the matches, so a query doesn't depend on the total number of birthdays.
+    """
+
+    def __init__(self, months: Sequence[int], days: Sequence[int]):
+        self._buckets: list[list[int]] = [[] for _ in range(366)]
+        for idx, (month, day) in enumerate(zip(months, days)):
+            self._buckets[_MONTH_OFFSETS[month] + day - 1].append(idx)
+
+    def upcoming(self, birthday_calendar: BirthdayCalendar, n_days: int) -> list[tuple[date, int]]:
+        """Birthdays from today to 'n_days' days later, inclusive, as (date, index) pairs in order of date.
+
+        The range may cross the end of year. Each birthday is returned at most once, even if 'n_days' exceeds a year.
+        """
+        feb_29 = day_of_year(2, 29)
+        feb_29_alias = (3, 1) if birthday_calendar.remind_29_feb_on_1_mar else (2, 28)
+        visited = bytearray(366)
+        result: list[tuple[date, int]] = []
+        current = birthday_calendar.today
+        for _ in range(min(n_days, 366) + 1):
+            doys = [day_of_year(current.month, current.day)]
+            if (current.month, current.day) == feb_29_alias and not calendar.isleap(current.year):
+                # buckets of one date go in order of birth dates: Feb 28, Feb 29, Mar 1
+                doys = [doys[0], feb_29] if current.month == 2 else [feb_29, doys[0]]
+            for doy in doys:
+                if not visited[doy]:
+                    visited[doy] = 1
+                    result.extend((current, idx) for idx in self._buckets[doy])
+            current += timedelta(days=1)
+        return result
+
+
+def sorted_order(keys: Sequence[int]) -> list[int]:
+    """Indices that sort 'keys', stable. Keys must be non-negative and fit in 32 bits.
+
+    Each key is packed with its index into one int, so it's a plain sort of ints, without key function.
+    """
+    packed = [key << 32 | idx for idx, key in enumerate(keys)]
+    packed.sort()
+    return [value & 0xFFFFFFFF for value in packed]
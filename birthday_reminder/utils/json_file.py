@@ -0,0 +1,23 @@
+import json
+import os
+
+
+def load_json(file_path: str, default=None):
+    """Returns content of json file, or 'default' if file doesn't exist or is corrupted"""
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json(file_path: str, data):
+    """Writes json atomically, so that a crash in the middle never leaves a corrupted file"""
+    dirname = os.path.dirname(os.path.abspath(file_path))
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    tmp_file_path = f"{file_path}.tmp"
+    with open(tmp_file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file_path, file_path)
@@ -0,0 +1,58 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket, shared by all worker threads that send requests to the same API.
+
+    Besides limiting the rate, it coordinates backoff: when any worker hits the quota,
+    all workers pause, and the pause grows exponentially while errors continue.
+    """
+
+    def __init__(self, qps: float, delays: list[int]):
+        assert qps > 0, "qps must be positive"
+        self.qps = qps
+        self.delays = delays
+
+        self._capacity = max(1.0, qps)  # allow bursts of up to one second of requests
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff_level = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """Blocks until 'tokens' requests can be sent. Requests are served in order of arrival"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, tokens: int = 1) -> float:
+        """Reserves 'tokens' requests. Returns how long the caller must wait before sending them.
+
+        Use it instead of 'acquire' if blocking is not an option, e.g. in asyncio code.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self.qps)
+            self._last_refill = now
+
+            # tokens may become negative: this reserves them for the caller, next callers wait longer
+            self._tokens -= tokens
+            return max(-self._tokens / self.qps, self._paused_until - now, 0.0)
+
+    def back_off(self) -> float:
+        """Pauses all requests after quota error. Returns pause duration in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._paused_until:
+                # errors received during the pause belong to the same episode and don't escalate it
+                delay = self.delays[min(self._backoff_level, len(self.delays) - 1)]
+                self._backoff_level += 1
+                self._paused_until = now + delay
+            return self._paused_until - now
+
+    def report_success(self):
+        with self._lock:
+            if time.monotonic() >= self._paused_until:
+                self._backoff_level = 0
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent, compare_events_file_and_google
+from birthday_reminder.configs.main_config import MainConfig
+
+
+@pytest.mark.benchmark
+class TestDiffBenchmark:
+    N_EVENTS = 100_000
+
+    @staticmethod
+    def _make_events(n: int) -> tuple[list[BirthdayEvent], list[BirthdayEvent]]:
+        config = MainConfig()
+        start = datetime(1900, 1, 1)
+        file_events = [
+            BirthdayEvent(date=start + timedelta(days=idx), title=f"Person {idx}", has_year=True, config=config)
+            for idx in range(n)
+        ]
+        google_events = [BirthdayEvent.from_google_event(e.to_google_event()) for e in file_events]
+        return file_events, google_events
+
+    def test_diff(self, utils):
+        file_events, google_events = self._make_events(self.N_EVENTS)
+
+        # every tenth event is updated
+        config2 = MainConfig()
+        config2.popup_reminders_minutes = [30]
+        for event in file_events[::10]:
+            event.config = config2
+
+        cold_s, cmp_result = utils.measure(compare_events_file_and_google, file_events, google_events)
+        warm_s, _ = utils.measure(compare_events_file_and_google, file_events, google_events)
+        print(
+            f"\nDiff of {self.N_EVENTS} events: {cold_s:.2f} s with signatures computed, "
+            f"{warm_s:.2f} s with signatures cached"
+        )
+
+        assert len(cmp_result.updated_events) == self.N_EVENTS // 10
+        assert len(cmp_result.equal_events) == self.N_EVENTS - self.N_EVENTS // 10
+        assert warm_s < cold_s
+
+    def test_diff_stored_hash(self, utils):
+        file_events, google_events = self._make_events(self.N_EVENTS)
+        stored_events = [e.google_event for e in google_events if e.google_event is not None]
+        legacy_events = [
+            BirthdayEvent.from_google_event({k: v for k, v in e.items() if k != "extendedProperties"})
+            for e in stored_events
+        ]
+        for event in file_events:
+            event.content_hash  # file side is hashed in both cases, measure only the google side
+        for event in google_events:
+            event.trust_stored_content_hash()  # events are not edited since upload
+
+        legacy_s, legacy_result = utils.measure(compare_events_file_and_google, file_events, legacy_events)
+        stored_s, stored_result = utils.measure(compare_events_file_and_google, file_events, google_events)
+        print(
+            f"\nDiff of {self.N_EVENTS} events: {legacy_s:.2f} s with google events hashed structurally, "
+            f"{stored_s:.2f} s with stored hashes"
+        )
+
+        assert len(stored_result.equal_events) == len(legacy_result.equal_events) == self.N_EVENTS
+        assert stored_s < legacy_s
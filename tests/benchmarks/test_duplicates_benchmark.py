@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.file_reader import FileReader
+
+
+@pytest.mark.benchmark
+class TestDuplicatesBenchmark:
+    N_LINES = [12_500, 25_000, 50_000]
+
+    @staticmethod
+    def _write_file(tmpdir, n_lines: int) -> str:
+        """Every tenth line duplicates the line before it"""
+        start = datetime(1900, 1, 1)
+        lines = []
+        for idx in range(n_lines):
+            date_idx = idx - 1 if idx % 10 == 9 else idx
+            lines.append(f"{(start + timedelta(days=date_idx)).strftime('%Y-%m-%d')} Person {date_idx}\n")
+
+        filepath = tmpdir.join(f"duplicates_{n_lines}.txt")
+        filepath.write("".join(lines))
+        return str(filepath)
+
+    def test_scaling(self, tmpdir, utils):
+        def read(input_file: str) -> str:
+            config = MainConfig()
+            config.input_file = input_file
+            with pytest.raises(ValueError) as e:
+                FileReader(config=config)
+            return str(e.value)
+
+        times = []
+        for n_lines in self.N_LINES:
+            seconds, message = utils.measure(read, self._write_file(tmpdir, n_lines))
+            times.append(seconds)
+            print(f"\nDuplicates in {n_lines} lines reported in {seconds:.2f} s")
+            assert f"{n_lines // 10} groups of duplicate events" in message
+
+        # quadratic algorithm would take 16 times longer on 4 times more lines
+        assert times[-1] / times[0] < 8
@@ -0,0 +1,52 @@
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+
+
+@pytest.mark.benchmark
+class TestEventStoreBenchmark:
+    N_EVENTS = 200_000
+    N_NAMES = 1000  # names repeat in real files, so titles repeat too
+
+    def _fields(self):
+        start = datetime(1950, 1, 1)
+        for idx in range(self.N_EVENTS):
+            yield start + timedelta(days=idx % 20_000), f"Person {idx % self.N_NAMES}", idx % 3 != 0
+
+    @staticmethod
+    def _measure_memory(fn) -> tuple[int, Any]:
+        tracemalloc.start()
+        result = fn()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size, result
+
+    def test_memory_per_event(self):
+        config = MainConfig()
+
+        def make_events():
+            return [
+                BirthdayEvent(date, title, has_year=has_year, config=config) for date, title, has_year in self._fields()
+            ]
+
+        def make_store():
+            store = EventStore(config)
+            for date, title, has_year in self._fields():
+                store.append(date, title, has_year)
+            return store
+
+        events_size, events = self._measure_memory(make_events)
+        store_size, store = self._measure_memory(make_store)
+        print(
+            f"\nMemory per event: {events_size / self.N_EVENTS:.1f} bytes in BirthdayEvent list, "
+            f"{store_size / self.N_EVENTS:.1f} bytes in EventStore"
+        )
+
+        assert store[:1000] == events[:1000]
+        assert store_size * 10 < events_size
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.file_reader import FileReader
+
+
+@pytest.mark.benchmark
+class TestEventsCacheBenchmark:
+    N_LINES = 1_000_000
+
+    def test_cold_and_warm(self, tmpdir, utils):
+        start = datetime(1900, 1, 1)
+        filepath = tmpdir.join("birthdays.txt")
+        filepath.write(
+            "".join(
+                f"{(start + timedelta(days=idx)).strftime('%Y-%m-%d')} Person {idx}\n" for idx in range(self.N_LINES)
+            )
+        )
+        config = MainConfig()
+        config.input_file = str(filepath)
+        config.cache_dir = str(tmpdir.join("cache"))
+
+        cold_s, cold_reader = utils.measure(FileReader, config)
+        warm_s, warm_reader = utils.measure(FileReader, config)
+        print(f"\nReading {self.N_LINES} lines: {cold_s:.2f} s cold, {warm_s:.2f} s warm (from cache)")
+
+        assert len(warm_reader.events) == self.N_LINES
+        assert warm_reader.events[-1] == cold_reader.events[-1]
+        assert warm_s < cold_s / 10
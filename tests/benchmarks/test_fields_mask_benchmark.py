@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from fake_google_calendar import FakeCalendarHttp
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+
+
+@pytest.mark.benchmark
+class TestFieldsMaskBenchmark:
+    N_EVENTS = 20_000
+
+    def test_list_payload(self, utils):
+        with open(utils.test_resource("google_events_list.json"), encoding="utf-8") as f:
+            response = json.load(f)
+        items = response["items"]
+        response["items"] = [dict(items[idx % len(items)], id=f"event{idx}") for idx in range(self.N_EVENTS)]
+
+        full_payload = json.dumps(response).encode("utf-8")
+        masked_response = FakeCalendarHttp.select_fields(
+            response, FakeCalendarHttp._parse_fields(GoogleCalendarApi._LIST_FIELDS)
+        )
+        masked_payload = json.dumps(masked_response).encode("utf-8")
+
+        def hashes(items: list[dict]) -> list[str]:
+            return [BirthdayEvent.from_google_event(item).content_hash for item in items]
+
+        for name, payload in [("full response", full_payload), ("with fields mask", masked_payload)]:
+            decode_s, decoded = utils.measure(json.loads, payload)
+            hashes_s, _ = utils.measure(hashes, decoded["items"])
+            print(
+                f"\nList of {self.N_EVENTS} events, {name}: {len(payload) / 2**20:.1f} MiB, "
+                f"{decode_s:.2f} s for json, {hashes_s:.2f} s for events"
+            )
+
+        assert hashes(json.loads(masked_payload)["items"]) == hashes(json.loads(full_payload)["items"])
+        assert len(masked_payload) < len(full_payload)
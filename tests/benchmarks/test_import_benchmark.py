@@ -0,0 +1,41 @@
+import os.path
+import re
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.benchmark
+class TestImportBenchmark:
+    # cumulative import time of the module with everything it imports, as reported by -X importtime.
+    # Margin is for slow machines, usually it's 50-70 ms
+    IMPORT_BUDGET_MS = {"birthday_reminder.app": 90}
+    N_RUNS = 5
+
+    @staticmethod
+    def _import_times_us(module: str) -> dict[str, int]:
+        project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=project_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)", line)
+            if match and match.group(2) not in times:
+                times[match.group(2)] = int(match.group(1))
+        return times
+
+    @pytest.mark.parametrize("module, budget_ms", list(IMPORT_BUDGET_MS.items()))
+    def test_import_time(self, module, budget_ms):
+        # the best of several runs: the first one may compile .pyc files, others are noisy
+        import_ms = min(self._import_times_us(module)[module] for _ in range(self.N_RUNS)) / 1000
+        google_ms = self._import_times_us("birthday_reminder.drivers.google_calendar_api")[
+            "birthday_reminder.drivers.google_calendar_api"
+        ]
+        print(f"\nImport of {module}: {import_ms:.1f} ms, Google driver alone: {google_ms / 1000:.1f} ms")
+        assert import_ms < budget_ms
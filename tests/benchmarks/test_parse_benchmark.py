@@ -0,0 +1,93 @@
+import contextlib
+import os
+import tracemalloc
+
+import pytest
+
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.file_reader import FileReader
+
+
+@pytest.mark.benchmark
+class TestParseBenchmark:
+    N_LINES = [50_000, 200_000]
+    N_LINES_SPEED = 1_000_000
+    N_LINES_PARALLEL = [1_000_000, 5_000_000, 10_000_000]
+    PARSE_WORKERS = 4
+
+    @staticmethod
+    def _write_file(tmpdir, n_lines: int) -> str:
+        """Each line has an error, so that FileReader keeps no events"""
+        filepath = tmpdir.join(f"errors_{n_lines}.txt")
+        filepath.write("".join(f"2001-13-01 Person {idx}\n" for idx in range(n_lines)))
+        return str(filepath)
+
+    def test_memory_is_flat(self, tmpdir, utils):
+        peaks = []
+        for n_lines in self.N_LINES:
+            config = MainConfig()
+            config.input_file = self._write_file(tmpdir, n_lines)
+
+            # errors are printed as they are found, captured output must not be counted
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                tracemalloc.start()
+                seconds, _ = utils.measure(pytest.raises, ValueError, FileReader, config)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            peaks.append(peak)
+            print(f"\nValidation of {n_lines} lines with errors: {seconds:.2f} s, peak memory {peak / 2**20:.2f} MiB")
+
+        # buffering all lines would take 4 times more memory for 4 times more lines
+        assert peaks[-1] < 2 * peaks[0]
+
+    def test_date_parsing_speed(self, utils, monkeypatch):
+        lines = [
+            (
+                f"{1950 + idx % 70}-{idx % 12 + 1:02}-{idx % 28 + 1:02} Person {idx}\n"
+                if idx % 2
+                else f"{idx % 12 + 1:02}-{idx % 28 + 1:02} Person {idx}\n"
+            )
+            for idx in range(self.N_LINES_SPEED)
+        ]
+        config = MainConfig()
+
+        def parse() -> int:
+            return sum(1 for _ in FileReader._parse_lines(config, lines))
+
+        fast_s, n_parsed = utils.measure(parse)
+        assert n_parsed == self.N_LINES_SPEED
+
+        monkeypatch.setattr(FileReader, "_parse_date_fast", classmethod(lambda cls, date_str: None))
+        strptime_s, _ = utils.measure(parse)
+        print(
+            f"\nParsing of {self.N_LINES_SPEED} lines: {fast_s:.2f} s with fast path, {strptime_s:.2f} s with strptime"
+        )
+
+        assert fast_s < strptime_s
+
+    @pytest.mark.parametrize("n_lines", N_LINES_PARALLEL)
+    def test_parallel_parsing(self, tmpdir, utils, n_lines):
+        filepath = tmpdir.join(f"birthdays_{n_lines}.txt")
+        with open(filepath, "w", encoding="utf-8") as f:
+            for start in range(0, n_lines, 100_000):
+                f.write(
+                    "".join(
+                        f"{1950 + idx % 70}-{idx % 12 + 1:02}-{idx % 28 + 1:02} Person {idx}\n"
+                        for idx in range(start, min(start + 100_000, n_lines))
+                    )
+                )
+
+        def count_events(parse_workers: int) -> int:
+            config = MainConfig()
+            config.input_file = str(filepath)
+            config.parse_workers = parse_workers
+            # events are not kept, so that memory doesn't limit the file size
+            return sum(1 for _ in FileReader.parse_file(config))
+
+        serial_s, n_serial = utils.measure(count_events, 1)
+        parallel_s, n_parallel = utils.measure(count_events, self.PARSE_WORKERS)
+        print(
+            f"\nParsing of {n_lines} lines: {serial_s:.2f} s serial, "
+            f"{parallel_s:.2f} s with {self.PARSE_WORKERS} processes ({os.cpu_count()} CPUs available)"
+        )
+        assert n_serial == n_parallel == n_lines
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+from birthday_reminder.utils.birthday_calendar import reference_time, sorted_order
+
+
+@pytest.mark.benchmark
+class TestSortBenchmark:
+    N_EVENTS = 1_000_000
+    N_EVENTS_PER_OBJECT = 200_000
+
+    @staticmethod
+    def _make_store(n: int) -> EventStore:
+        store = EventStore(MainConfig())
+        start = datetime(1950, 1, 1)
+        for idx in range(n):
+            store.append(start + timedelta(days=idx % 25_000), f"Person {idx}", has_year=idx % 3 != 0)
+        return store
+
+    @pytest.mark.parametrize("sort_type", list(BirthdayEvent.SortTypes))
+    def test_sort(self, utils, sort_type):
+        store = self._make_store(self.N_EVENTS)
+
+        with reference_time():
+            keys_s, keys = utils.measure(store.sort_keys, sort_type)
+            sort_s, order = utils.measure(sorted_order, keys)
+        print(f"\nSort of {self.N_EVENTS} events by {sort_type}: {keys_s:.2f} s for keys, {sort_s:.2f} s for sort")
+        assert order == sorted(range(len(keys)), key=keys.__getitem__)
+
+    def test_sort_next_per_object(self, utils):
+        store = self._make_store(self.N_EVENTS_PER_OBJECT)
+        events = list(store)
+
+        def sort_batch():
+            return sorted_order(store.sort_keys(BirthdayEvent.SortTypes.next))
+
+        def sort_per_object():
+            return sorted(range(len(events)), key=lambda idx: events[idx].days_until_next_birthday)
+
+        with reference_time():
+            batch_s, batch_order = utils.measure(sort_batch)
+            per_object_s, per_object_order = utils.measure(sort_per_object)
+        print(
+            f"\nSort of {self.N_EVENTS_PER_OBJECT} events by next birthday: {batch_s:.2f} s with integer keys, "
+            f"{per_object_s:.2f} s with per-object properties"
+        )
+
+        assert batch_order == per_object_order
+        assert batch_s < per_object_s
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+from birthday_reminder.utils.birthday_calendar import BirthdayCalendar, BirthdayIndex, reference_time, sorted_order
+
+
+@pytest.mark.benchmark
+class TestUpcomingBenchmark:
+    N_EVENTS = 1_000_000
+    N_DAYS = 7
+
+    def test_upcoming(self, utils):
+        store = EventStore(MainConfig())
+        start = datetime(1950, 1, 1)
+        for idx in range(self.N_EVENTS):
+            store.append(start + timedelta(days=idx % 25_000), f"Person {idx}", has_year=idx % 3 != 0)
+
+        def query_sorted():
+            keys = store.sort_keys(BirthdayEvent.SortTypes.next)
+            order = sorted_order(keys)
+            return [idx for idx in order[: next(i for i, idx in enumerate(order) if keys[idx] > self.N_DAYS)]]
+
+        with reference_time():
+            birthday_calendar = BirthdayCalendar.get(store.config.remind_29_feb_on_1_mar)
+            sorted_s, _ = utils.measure(query_sorted)
+            build_s, index = utils.measure(BirthdayIndex, store._months, store._days)
+            index_s, matches = utils.measure(index.upcoming, birthday_calendar, self.N_DAYS)
+            views_s, _ = utils.measure(store.upcoming, self.N_DAYS)
+        print(
+            f"\nUpcoming {self.N_DAYS} days in {self.N_EVENTS} events ({len(matches)} matches): "
+            f"{sorted_s:.2f} s with full sort, {build_s:.2f} s to build the index once, "
+            f"{index_s * 1000:.1f} ms per query with index, {views_s:.2f} s with event views"
+        )
+        assert index_s < sorted_s
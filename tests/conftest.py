@@ -1,6 +1,23 @@
 import os.path
+import time
 
 import pytest
+from fake_google_calendar import FakeCalendarHttp
+
+from birthday_reminder.configs.main_config import MainConfig
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmarks", action="store_true", help="Run benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmarks run only with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
 
 
 class Utils:
@@ -8,7 +25,32 @@ class Utils:
     def test_resource(path):
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_resources", path)
 
+    @staticmethod
+    def measure(fn, *args, **kwargs) -> tuple[float, object]:
+        """Returns execution time in seconds and result of the call"""
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return time.perf_counter() - start, result
+
 
 @pytest.fixture(scope="session")
 def utils():
     return Utils
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """By default local state goes to 'cache' folder of the project. Every test gets its own folder instead"""
+    init = MainConfig.__init__
+
+    def init_with_isolated_cache_dir(self):
+        init(self)
+        self.cache_dir = str(tmp_path / "cache")
+
+    monkeypatch.setattr(MainConfig, "__init__", init_with_isolated_cache_dir)
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    monkeypatch.setattr("birthday_reminder.drivers.google_calendar_api.time.sleep", lambda seconds: None)
+    return FakeCalendarHttp()
@@ -0,0 +1,371 @@
+import asyncio
+import email.parser
+import itertools
+import json
+import threading
+import urllib.parse
+import uuid
+from typing import Any
+
+import httplib2
+from aiohttp import web
+
+
+class FakeCalendarHttp:
+    """In-memory fake of the Google Calendar v3 REST API, that acts like httplib2.Http
+
+    Pass it to GoogleCalendarApi as 'http' to run the driver without network and authorization.
+    Supports calendars, events and batch requests. Failures can be injected with 'fail'.
+    """
+
+    _API_PREFIX = "/calendar/v3"
+    _BATCH_PATH = "/batch/calendar/v3"
+
+    def __init__(self):
+        self.calendars: dict[str, dict] = {}
+        self.events: dict[str, dict[str, dict]] = {}  # calendar_id -> event_id -> event
+        self.requests: list[tuple[str, str]] = []  # (method, path) of every HTTP round trip
+        self.sub_requests: list[tuple[str, str]] = []  # (method, path) of every API call, including batched ones
+        self.list_queries: list[dict] = []  # query params of every events list call
+
+        self._failures: list[dict] = []
+        self._ids = itertools.count(1)
+        self._last_change = 0
+        self._event_changes: dict[str, int] = {}  # event_id -> number of the last change
+        self._min_sync_token = 0
+        self._lock = threading.RLock()
+
+    # --- helpers for tests ---
+
+    def add_calendar(self, summary: str) -> dict:
+        calendar = {"id": f"cal{next(self._ids)}@group.calendar.google.com", "summary": summary}
+        self.calendars[calendar["id"]] = calendar
+        self.events[calendar["id"]] = {}
+        return calendar
+
+    def add_event(self, calendar_id: str, event: dict) -> dict:
+        event_id = event.get("id", f"ev{next(self._ids)}")
+        # fields that Google adds to every event, but the program doesn't use
+        event = dict(
+            kind="calendar#event",
+            htmlLink=f"https://www.google.com/calendar/event?eid={event_id}",
+            created="2020-01-01T00:00:00.000Z",
+            updated="2020-01-01T00:00:00.000Z",
+            creator={"email": "user@example.com"},
+            organizer={"email": calendar_id, "self": True},
+            iCalUID=f"{event_id}@google.com",
+            sequence=0,
+            eventType="default",
+            **event,
+        )
+        event.update(id=event_id, status=event.get("status", "confirmed"))
+        self.events[calendar_id][event["id"]] = event
+        self._touch(event)
+        return event
+
+    def edit_event(self, calendar_id: str, event_id: str, patch: dict) -> dict:
+        """Edits event like user does in Google Calendar UI"""
+        event = self.events[calendar_id][event_id]
+        self._merge_patch(event, patch)
+        self._touch(event)
+        return event
+
+    def invalidate_sync_tokens(self):
+        self._last_change += 1
+        self._min_sync_token = self._last_change
+
+    def fail(
+        self,
+        status: int,
+        times: int = 1,
+        method: str | None = None,
+        path_contains: str | None = None,
+        skip: int = 0,
+        after_call: bool = False,
+    ):
+        """Make next 'times' matching API calls fail with 'status', after 'skip' of them succeed.
+        If 'after_call', calls take effect and only their responses are lost, like when connection drops"""
+        self._failures.append(
+            dict(
+                status=status, times=times, method=method, path_contains=path_contains, skip=skip, after_call=after_call
+            )
+        )
+
+    def count_sub_requests(self, method: str, path_contains: str = "") -> int:
+        return len([r for r in self.sub_requests if r[0] == method and path_contains in r[1]])
+
+    def _touch(self, event: dict):
+        """Google changes etag of the event on every change"""
+        self._last_change += 1
+        self._event_changes[event["id"]] = self._last_change
+        event["etag"] = f'"{self._last_change}"'
+
+    # --- httplib2.Http interface ---
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        with self._lock:
+            parsed = urllib.parse.urlparse(uri)
+            self.requests.append((method, parsed.path))
+            if parsed.path == self._BATCH_PATH:
+                return self._batch(body, headers)
+            status, content = self._call(method, parsed.path, urllib.parse.parse_qs(parsed.query), body)
+            return self._response(status), json.dumps(content).encode("utf-8") if content is not None else b""
+
+    # --- internals ---
+
+    @staticmethod
+    def _response(status: int) -> httplib2.Response:
+        return httplib2.Response({"status": status, "content-type": "application/json"})
+
+    def _injected_failure(self, method: str, path: str, after_call: bool) -> int | None:
+        for failure in self._failures:
+            if failure["method"] not in [None, method] or failure["after_call"] != after_call:
+                continue
+            if failure["path_contains"] is not None and failure["path_contains"] not in path:
+                continue
+            if failure["skip"] > 0:
+                failure["skip"] -= 1
+                return None
+            failure["times"] -= 1
+            if failure["times"] <= 0:
+                self._failures.remove(failure)
+            return failure["status"]
+        return None
+
+    @staticmethod
+    def _error(status: int) -> tuple[int, dict]:
+        return status, {"error": {"code": status, "message": f"Fake error {status}"}}
+
+    @staticmethod
+    def _parse_fields(fields: str) -> dict:
+        """Parses partial response mask: 'items(id,start),nextPageToken' -> {'items': {'id': {}, 'start': {}}, ...}.
+        Empty dict means that the whole value is selected"""
+        root: dict = {}
+        stack = [root]
+        name = ""
+        for char in fields + ",":
+            if char in ",()":
+                if name:
+                    stack[-1][name] = {}
+                if char == "(":
+                    stack.append(stack[-1][name])
+                elif char == ")":
+                    stack.pop()
+                name = ""
+            else:
+                name += char.strip()
+        return root
+
+    @classmethod
+    def select_fields(cls, value, mask: dict):
+        """Leaves only fields from 'mask' (result of _parse_fields) in 'value', like Google does for 'fields' param"""
+        if not mask:
+            return value
+        if isinstance(value, list):
+            return [cls.select_fields(item, mask) for item in value]
+        if isinstance(value, dict):
+            return {k: cls.select_fields(v, mask[k]) for k, v in value.items() if k in mask}
+        return value
+
+    def _call(self, method: str, path: str, query: dict, body) -> tuple[int, dict | None]:
+        status, content = self._route(method, path, query, body)
+        if status < 300:
+            failure_status = self._injected_failure(method, path, after_call=True)
+            if failure_status is not None:
+                return self._error(failure_status)
+        if "fields" in query and status < 300:
+            content = self.select_fields(content, self._parse_fields(query["fields"][0]))
+        return status, content
+
+    def _route(self, method: str, path: str, query: dict, body) -> tuple[int, dict | None]:
+        self.sub_requests.append((method, path))
+
+        status = self._injected_failure(method, path, after_call=False)
+        if status is not None:
+            return self._error(status)
+
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        data: Any = json.loads(body) if body else None
+
+        parts = [urllib.parse.unquote(p) for p in path[len(self._API_PREFIX) :].strip("/").split("/")]
+        match parts, method:
+            case ["users", "me", "calendarList"], "GET":
+                return 200, self._page(list(self.calendars.values()), query, default_max_results=100)
+            case ["calendars"], "POST":
+                calendar = self.add_calendar(data["summary"])
+                calendar.update(data, id=calendar["id"])
+                return 200, calendar
+            case ["calendars", calendar_id], "PUT":
+                if calendar_id not in self.calendars:
+                    return self._error(404)
+                self.calendars[calendar_id] = dict(data, id=calendar_id)
+                return 200, self.calendars[calendar_id]
+            case ["calendars", calendar_id] | ["users", "me", "calendarList", calendar_id], "GET":
+                # calendar and its entry in the list of calendars share one dict here
+                if calendar_id not in self.calendars:
+                    return self._error(404)
+                return 200, self.calendars[calendar_id]
+            case ["calendars", calendar_id], "DELETE":
+                if self.calendars.pop(calendar_id, None) is None:
+                    return self._error(404)
+                del self.events[calendar_id]
+                return 204, None
+            case ["users", "me", "calendarList", calendar_id], "PATCH":
+                if calendar_id not in self.calendars:
+                    return self._error(404)
+                self._merge_patch(self.calendars[calendar_id], data)
+                return 200, self.calendars[calendar_id]
+            case ["calendars", calendar_id, "events"], "GET":
+                return self._list_events(calendar_id, query)
+            case ["calendars", calendar_id, "events"], "POST":
+                if calendar_id not in self.events:
+                    return self._error(404)
+                if data.get("id") in self.events[calendar_id]:
+                    return self._error(409)  # Google keeps ids of deleted events too
+                return 200, self.add_event(calendar_id, data)
+            case ["calendars", calendar_id, "events", event_id], _:
+                return self._modify_event(method, calendar_id, event_id, data)
+        return self._error(404)
+
+    def _list_events(self, calendar_id: str, query: dict) -> tuple[int, dict | None]:
+        self.list_queries.append(query)
+        if calendar_id not in self.events:
+            return self._error(404)
+        items = list(self.events[calendar_id].values())
+        if "syncToken" in query:
+            sync_token = int(query["syncToken"][0])
+            if sync_token < self._min_sync_token:
+                return self._error(410)
+            # incremental sync returns deleted events too
+            items = [item for item in items if self._event_changes[item["id"]] > sync_token]
+        else:
+            items = [item for item in items if item["status"] != "cancelled"]
+        result = self._page(items, query, default_max_results=250)
+        if "nextPageToken" not in result:
+            result["nextSyncToken"] = str(self._last_change)
+        return 200, result
+
+    @staticmethod
+    def _page(items: list, query: dict, default_max_results: int) -> dict:
+        max_results = int(query.get("maxResults", [str(default_max_results)])[0])
+        start = int(query.get("pageToken", ["0"])[0])
+
+        result: dict = {"items": items[start : start + max_results]}
+        if start + max_results < len(items):
+            result["nextPageToken"] = str(start + max_results)
+        return result
+
+    @classmethod
+    def _merge_patch(cls, target: dict, patch: dict):
+        """Patch semantics of Google API: nested objects are merged, null clears a field, the rest is replaced"""
+        for key, value in patch.items():
+            if value is None:
+                target.pop(key, None)
+            elif isinstance(value, dict) and isinstance(target.get(key), dict):
+                cls._merge_patch(target[key], value)
+            else:
+                target[key] = value
+
+    def _modify_event(self, method: str, calendar_id: str, event_id: str, data) -> tuple[int, dict | None]:
+        events = self.events.get(calendar_id, {})
+        event = events.get(event_id)
+        if event is None:
+            return self._error(404)
+        if event["status"] == "cancelled":
+            return self._error(410)
+        match method:
+            case "GET":
+                return 200, event
+            case "PUT":
+                events[event_id] = dict(data, id=event_id, status="confirmed")
+                self._touch(events[event_id])
+                return 200, events[event_id]
+            case "PATCH":
+                self._merge_patch(event, data)
+                self._touch(event)
+                return 200, event
+            case "DELETE":
+                event["status"] = "cancelled"
+                self._touch(event)
+                return 204, None
+        return self._error(405)
+
+    def _batch(self, body: str, headers: dict):
+        parser = email.parser.Parser()
+        message: Any = parser.parsestr(f"content-type: {headers['content-type']}\r\n\r\n{body}")
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        response_parts = []
+        for part in message.get_payload():
+            content_id = part["Content-ID"]
+            request_line, request_rest = part.get_payload().split("\n", 1)
+            method, path_query, _ = request_line.split(" ", 2)
+            request_message = parser.parsestr(request_rest)
+            parsed = urllib.parse.urlparse(path_query)
+
+            status, content = self._call(
+                method, parsed.path, urllib.parse.parse_qs(parsed.query), request_message.get_payload() or None
+            )
+            content_str = json.dumps(content) if content is not None else ""
+            response_parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} Fake\r\n"
+                f"Content-Type: application/json\r\n\r\n"
+                f"{content_str}\r\n"
+            )
+        response_content = "".join(response_parts) + f"--{boundary}--\r\n"
+
+        response = httplib2.Response({"status": 200, "content-type": f'multipart/mixed; boundary="{boundary}"'})
+        return response, response_content.encode("utf-8")
+
+
+class FakeCalendarServer:
+    """Local aiohttp server that serves FakeCalendarHttp over real HTTP. Use as a context manager.
+
+    'url' is the base url of the Calendar API, 'client_ports' are ports of all connections opened by clients.
+    """
+
+    def __init__(self, fake_http: FakeCalendarHttp):
+        self.fake_http = fake_http
+        self.url = ""
+        self.client_ports: set[int] = set()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner: web.AppRunner | None = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.client_ports.add(request.transport.get_extra_info("peername")[1])  # type: ignore
+        body = await request.text()
+        with self.fake_http._lock:
+            self.fake_http.requests.append((request.method, request.path))
+            status, content = self.fake_http._call(
+                request.method, request.path, urllib.parse.parse_qs(request.query_string), body or None
+            )
+        if content is None:
+            return web.Response(status=status)
+        return web.json_response(content, status=status)
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/calendar/v3"
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *args):
+        assert self._runner is not None
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
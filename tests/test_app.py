@@ -0,0 +1,384 @@
+import json
+import os.path
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from birthday_reminder.app import main
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+from birthday_reminder.drivers.upload_journal import UploadCheckpoint
+from birthday_reminder.utils.birthday_calendar import reference_time
+
+
+class TestApp:
+    # libraries that take most of the startup time and are needed only for Google Calendar
+    GOOGLE_ONLY_MODULES = [
+        "googleapiclient",
+        "google.auth",
+        "google_auth_oauthlib",
+        "aiohttp",
+        "tqdm",
+        "pytz",
+        "dateutil",
+    ]
+
+    @pytest.fixture
+    def app(self, tmpdir, fake_http, monkeypatch):
+        monkeypatch.setattr(
+            "birthday_reminder.app.create_google_calendar_api", lambda config: GoogleCalendarApi(config, http=fake_http)
+        )
+
+        class App:
+            input_file = tmpdir.join("Birthdays.txt")
+            config_file = tmpdir.join("config.yaml")
+
+            def __init__(self):
+                self.set_config("")
+
+            def set_config(self, extra_yaml: str):
+                self.config_file.write(
+                    f'input_file: "{self.input_file}"\ncache_dir: "{tmpdir.join("cache")}"\nqps: 1000.0\n{extra_yaml}'
+                )
+
+            def run(self, *args) -> int:
+                return main([args[0], "-c", str(self.config_file), *args[1:]])
+
+            def google_titles(self) -> list[str]:
+                (calendar,) = fake_http.calendars.values()
+                events = fake_http.events[calendar["id"]].values()
+                return sorted(e["summary"] for e in events if e["status"] != "cancelled")
+
+        return App()
+
+    def test_upload_uses_journal(self, app, fake_http):
+        app.input_file.write("2000-01-01 Ivan\n2000-01-02 Petr\n01-03 Anna\n")
+        assert app.run("upload", "-y") == 0
+        assert app.google_titles() == ["🎁 Anna", "🎁 Ivan", "🎁 Petr"]
+
+        # nothing changed: Google Calendar is not listed
+        list_calls = fake_http.count_sub_requests("GET", "/events")
+        assert app.run("upload", "-y") == 0
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls
+
+        # file edited
+        app.input_file.write("2000-01-01 Ivan\n2000-01-02 Petr Petrov\n01-04 Olga\n")
+        assert app.run("upload", "-y") == 0
+        assert app.google_titles() == ["🎁 Ivan", "🎁 Olga", "🎁 Petr Petrov"]
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls
+
+        # config changed, events are updated in place
+        app.set_config("popup_reminders_minutes: [30]")
+        assert app.run("upload", "-y") == 0
+        (calendar,) = fake_http.calendars.values()
+        events = [e for e in fake_http.events[calendar["id"]].values() if e["status"] != "cancelled"]
+        assert [e["reminders"]["overrides"][0]["minutes"] for e in events] == [30, 30, 30]
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls
+
+        # verification compares with Google Calendar
+        assert app.run("upload", "-y", "--verify") == 0
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls + 1
+
+    def test_use_time_switch_through_journal(self, app, fake_http):
+        app.input_file.write("2000-01-01 Ivan\n")
+        assert app.run("upload", "-y") == 0
+
+        (calendar,) = fake_http.calendars.values()
+        (event,) = fake_http.events[calendar["id"]].values()
+        app.set_config("use_time: true")
+        assert app.run("upload", "-y") == 0
+        assert set(event["start"]) == set(event["end"]) == {"dateTime", "timeZone"}
+
+        app.set_config("")
+        assert app.run("upload", "-y") == 0
+        assert set(event["start"]) == set(event["end"]) == {"date"}
+
+    def test_verify_finds_manually_edited_reminders(self, app, fake_http):
+        app.input_file.write("2000-01-01 Ivan\n")
+        assert app.run("upload", "-y") == 0
+
+        (calendar,) = fake_http.calendars.values()
+        (event,) = fake_http.events[calendar["id"]].values()
+        reminders = {"useDefault": False, "overrides": [{"method": "popup", "minutes": 5}]}
+        fake_http.edit_event(calendar["id"], event["id"], {"reminders": reminders})
+        assert app.run("upload", "-y", "--verify") == 0
+        assert event["reminders"]["overrides"] != [{"method": "popup", "minutes": 5}]
+        assert fake_http.count_sub_requests("PATCH", "/events") == 1
+
+    def test_events_not_edited_since_upload_are_compared_by_stored_hash(self, app, fake_http, monkeypatch):
+        trusted: list[str] = []
+        trust_stored_content_hash = BirthdayEvent.trust_stored_content_hash
+
+        def trust_spy(event):
+            trusted.append(event.title)
+            trust_stored_content_hash(event)
+
+        monkeypatch.setattr(BirthdayEvent, "trust_stored_content_hash", trust_spy)
+        app.input_file.write("2000-01-01 Ivan\n2000-01-02 Petr\n")
+        assert app.run("upload", "-y") == 0
+        app.set_config("popup_reminders_minutes: [30]")
+        assert app.run("upload", "-y") == 0  # etags of patched events are recorded too
+
+        assert app.run("upload", "-y", "--verify") == 0
+        assert sorted(trusted) == ["🎁 Ivan", "🎁 Petr"]
+
+        # edited event gets a new etag, so it's compared structurally and the edit is found
+        (calendar,) = fake_http.calendars.values()
+        event = next(e for e in fake_http.events[calendar["id"]].values() if e["summary"] == "🎁 Ivan")
+        fake_http.edit_event(calendar["id"], event["id"], {"description": "Edited"})
+        trusted.clear()
+        patch_calls = fake_http.count_sub_requests("PATCH", "/events")
+        assert app.run("upload", "-y", "--verify") == 0
+        assert trusted == ["🎁 Petr"]
+        assert fake_http.count_sub_requests("PATCH", "/events") == patch_calls + 1
+        assert event["description"] != "Edited"
+
+    def test_failed_upload_invalidates_journal(self, app, fake_http, monkeypatch):
+        monkeypatch.setattr(GoogleCalendarApi, "_DELAYS", [0])
+        app.input_file.write("2000-01-01 Ivan\n")
+        assert app.run("upload", "-y") == 0
+
+        app.input_file.write("2000-01-01 Ivan\n2000-01-02 Petr\n")
+        fake_http.fail(500, method="POST", path_contains="/events")
+        assert app.run("upload", "-y") == 12
+
+        list_calls = fake_http.count_sub_requests("GET", "/events")
+        assert app.run("upload", "-y") == 0
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls + 1
+        assert app.google_titles() == ["🎁 Ivan", "🎁 Petr"]
+
+    def test_upload_of_other_file_invalidates_journal(self, app, tmpdir):
+        file_a, file_b = tmpdir.join("A.txt"), tmpdir.join("B.txt")
+        file_a.write("2000-01-01 Ivan\n")
+        file_b.write("2000-01-02 Petr\n")
+        for input_file in file_a, file_b, file_a:
+            app.input_file = input_file
+            app.set_config("")
+            assert app.run("upload", "-y") == 0
+            assert app.google_titles() == [f"🎁 {input_file.read().split()[1]}"]
+
+    @pytest.mark.parametrize("command", [["diff"], ["upload", "-y", "--verify"], ["plan", "--verify", "plan.json"]])
+    def test_duplicates_in_google_calendar(self, app, fake_http, tmpdir, monkeypatch, command):
+        monkeypatch.chdir(tmpdir)
+        app.input_file.write("2000-01-01 Ivan\n")
+        assert app.run("upload", "-y") == 0
+
+        (calendar,) = fake_http.calendars.values()
+        (event,) = fake_http.events[calendar["id"]].values()
+        content_keys = ["summary", "description", "start", "end", "recurrence", "reminders"]
+        fake_http.add_event(calendar["id"], {k: event[k] for k in content_keys})
+        assert app.run(*command) == 4
+
+    @pytest.mark.parametrize("edit_copy", [False, True])
+    def test_force_upload_replaces_duplicates(self, app, fake_http, capsys, edit_copy):
+        app.input_file.write("2000-01-01 Ivan\n")
+        assert app.run("upload", "-y") == 0
+
+        # exact copy, or a copy with the same date and title, but other content, so that it's unknown which to update
+        (calendar,) = fake_http.calendars.values()
+        (event,) = fake_http.events[calendar["id"]].values()
+        content_keys = ["summary", "description", "start", "end", "recurrence", "reminders"]
+        copy = {k: event[k] for k in content_keys}
+        if edit_copy:
+            copy["reminders"] = {"useDefault": False, "overrides": [{"method": "popup", "minutes": 5}]}
+        fake_http.add_event(calendar["id"], copy)
+        app.set_config("popup_reminders_minutes: [30]")
+        assert app.run("upload", "-y", "--verify") == 4
+        assert "upload --force" in capsys.readouterr().out
+
+        assert app.run("upload", "-y", "--force") == 0
+        assert app.google_titles() == ["🎁 Ivan"]
+        assert app.run("upload", "-y", "--verify") == 0
+
+    @staticmethod
+    def _birthdays(n: int) -> str:
+        return "".join(f"2000-01-{idx % 28 + 1:02d} Person {idx}\n" for idx in range(n))
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    def test_upload_resumes_after_failure(self, app, fake_http, monkeypatch, capsys, use_batch_requests):
+        monkeypatch.setattr(GoogleCalendarApi, "_DELAYS", [0])
+        monkeypatch.setattr(GoogleCalendarApi, "_MAX_BATCH_SIZE", 5)
+        app.set_config(f"use_batch_requests: {str(use_batch_requests).lower()}")
+        app.input_file.write(self._birthdays(30))
+
+        fake_http.fail(500, times=1000, method="POST", path_contains="/events", skip=10)
+        assert app.run("upload", "-y") == 12
+        assert len(app.google_titles()) == 10
+
+        # only requests that are not done are sent, Google Calendar is not listed
+        fake_http._failures.clear()
+        list_calls = fake_http.count_sub_requests("GET", "/events")
+        create_calls = fake_http.count_sub_requests("POST", "/events")
+        capsys.readouterr()
+        assert app.run("upload", "-y", "--resume") == 0
+        # only the failed request or batch was sent, the rest were not
+        n_in_flight = 5 if use_batch_requests else 1
+        assert f"10 of 30 requests are done, {n_in_flight} were in flight" in capsys.readouterr().out
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls
+        assert fake_http.count_sub_requests("POST", "/events") == create_calls + 20
+        assert app.google_titles() == sorted(f"🎁 Person {idx}" for idx in range(30))
+
+        # journal is saved, checkpoint is removed
+        assert app.run("upload", "-y") == 0
+        assert app.run("upload", "-y", "--resume") == 0
+        assert fake_http.count_sub_requests("GET", "/events") == list_calls
+        assert fake_http.count_sub_requests("POST", "/events") == create_calls + 20
+
+    def test_resume_doesnt_duplicate_events_in_flight(self, app, fake_http, monkeypatch):
+        monkeypatch.setattr(GoogleCalendarApi, "_DELAYS", [0])
+        app.input_file.write(self._birthdays(3))
+        assert app.run("upload", "-y") == 0
+
+        # the first new event is created, but the response is lost
+        app.input_file.write(self._birthdays(6))
+        fake_http.fail(503, method="POST", path_contains="/events", after_call=True)
+        assert app.run("upload", "-y") == 12
+        assert len(app.google_titles()) == 4
+
+        assert app.run("upload", "-y", "--resume") == 0
+        assert app.google_titles() == sorted(f"🎁 Person {idx}" for idx in range(6))
+
+    def test_force_upload_resumes_after_failure(self, app, fake_http, monkeypatch):
+        monkeypatch.setattr(GoogleCalendarApi, "_DELAYS", [0])
+        app.input_file.write(self._birthdays(5))
+        assert app.run("upload", "-y") == 0
+
+        # events are deleted, but not created yet
+        fake_http.fail(500, method="POST", path_contains="/events")
+        assert app.run("upload", "-y", "--force") == 11
+        assert app.google_titles() == []
+
+        assert app.run("upload", "-y", "--resume") == 0
+        assert app.google_titles() == sorted(f"🎁 Person {idx}" for idx in range(5))
+
+    def test_force_upload_recreates_calendar(self, app, fake_http):
+        app.input_file.write(self._birthdays(20))
+        assert app.run("upload", "-y") == 0
+        (old_id,) = fake_http.calendars
+
+        app.set_config("recreate_calendar_on_force: true")
+        fake_http.sub_requests.clear()
+        assert app.run("upload", "-y", "--force") == 0
+        assert fake_http.count_sub_requests("DELETE", "/events") == 0
+        assert fake_http.count_sub_requests("DELETE", "/calendars") == 1
+        assert old_id not in fake_http.calendars
+        assert app.google_titles() == sorted(f"🎁 Person {idx}" for idx in range(20))
+
+        # the journal and the calendar id belong to the new calendar
+        fake_http.sub_requests.clear()
+        assert app.run("upload", "-y") == 0
+        assert fake_http.sub_requests == []
+
+    def test_plan_and_apply(self, app, fake_http, tmpdir):
+        app.input_file.write("2000-01-01 Ivan\n2000-01-02 Petr\n01-03 Anna\n")
+        assert app.run("upload", "-y") == 0
+
+        app.input_file.write("2000-01-01 Ivan\n01-03 Anna\n01-04 Olga\n")
+        app.set_config("popup_reminders_minutes: [30]")
+        plan_file = str(tmpdir.join("plan.json"))
+        fake_http.sub_requests.clear()
+        assert app.run("plan", "--verify", plan_file) == 0
+        assert [method for method, _ in fake_http.sub_requests] == ["GET"]  # events are listed, nothing is changed
+
+        with open(plan_file, encoding="utf-8") as f:
+            plan = json.load(f)
+        assert {action: len(bodies) for action, bodies in plan["operations"].items()} == {
+            "DELETE": 1,
+            "PATCH": 2,
+            "CREATE": 1,
+        }
+        assert set(plan["operations"]["PATCH"][0]) == {"id", "reminders", "extendedProperties"}
+        assert plan["estimate"] == {"api_calls": 4, "http_requests": 4, "seconds": 0.0}
+
+        # the plan is applied as is, events are not compared again
+        fake_http.sub_requests.clear()
+        assert app.run("apply", plan_file) == 0
+        assert fake_http.count_sub_requests("GET", "/events") == 0
+        assert len(fake_http.sub_requests) == 4
+        assert app.google_titles() == ["🎁 Anna", "🎁 Ivan", "🎁 Olga"]
+
+        # journal is saved
+        fake_http.sub_requests.clear()
+        assert app.run("upload", "-y") == 0
+        assert fake_http.sub_requests == []
+
+    def test_checkpoint_save_error(self, app, fake_http, tmpdir, monkeypatch):
+        app.input_file.write("2000-01-01 Ivan\n")
+        plan_file = str(tmpdir.join("plan.json"))
+        assert app.run("plan", plan_file) == 0
+
+        def save(checkpoint):
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr(UploadCheckpoint, "save", save)
+        assert app.run("upload", "-y") == 12
+        assert app.run("upload", "-y", "--force") == 11
+        assert app.run("apply", plan_file) == 15
+        assert app.google_titles() == []
+
+    def test_plan_for_other_calendar_is_not_applied(self, app, fake_http, tmpdir):
+        app.input_file.write("2000-01-01 Ivan\n")
+        plan_file = str(tmpdir.join("plan.json"))
+        assert app.run("plan", plan_file) == 0
+
+        app.set_config('calendar_name: "Other"')
+        assert app.run("apply", plan_file) == 3
+        assert app.run("apply", str(tmpdir.join("missing.json"))) == 3
+        assert all(events == {} for events in fake_http.events.values())
+
+    def test_show_computes_stats_of_all_events_at_once(self, app, capsys, monkeypatch):
+        with reference_time(datetime(2023, 12, 30)):
+            app.input_file.write("2000-01-01 Ivan\n2000-06-01 Petr\n12-30 Anna\n")
+            assert app.run("show", "next") == 0
+            output = capsys.readouterr().out
+            for name in ["age", "days_until_next_birthday"]:
+                monkeypatch.setattr(BirthdayEvent, name, property(lambda self: pytest.fail("per event property used")))
+            assert app.run("show", "next") == 0
+            assert capsys.readouterr().out == output
+            assert "Anna. Birthday is today! (Next birthday in 366 days)" in output
+
+    def test_upcoming(self, app, capsys):
+        with reference_time(datetime(2023, 12, 30)):
+            app.input_file.write("2000-01-01 Ivan\n2000-06-01 Petr\n12-31 Anna\n")
+            assert app.run("upcoming", "--days", "2") == 0
+            output = capsys.readouterr().out
+            assert "Anna" in output and "Ivan" in output and "Petr" not in output
+            assert output.index("Anna") < output.index("Ivan")
+
+            app.input_file.write("2000-06-01 Petr\n")
+            assert app.run("upcoming", "-d", "1") == 0
+            assert "No birthdays in the next 1 days" in capsys.readouterr().out
+
+            app.input_file.write("2000-06-01 Petr\n12-30 Anna\n2000-12-31 Ivan\n")
+            assert app.run("upcoming", "-d", "0") == 0
+            output = capsys.readouterr().out
+            assert "Birthdays today" in output and "Anna" in output and "Ivan" not in output
+
+    @pytest.mark.parametrize("days", ["-1", "week"])
+    def test_upcoming_rejects_invalid_days(self, app, capsys, days):
+        with pytest.raises(SystemExit) as e:
+            app.run("upcoming", "--days", days)
+        assert e.value.code == 2
+        assert "--days" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("command", ["validate", "show next", "upcoming"])
+    def test_local_commands_dont_import_google_libraries(self, app, command):
+        app.input_file.write("2000-01-01 Ivan\n")
+        # fresh interpreter, because test modules import everything
+        code = (
+            "import sys\n"
+            "from birthday_reminder.app import main\n"
+            f"assert main({[*command.split(), '-c', str(app.config_file)]}) == 0\n"
+            "print(' '.join(sys.modules))"
+        )
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=project_dir, capture_output=True, text=True, check=True
+        )
+        modules = result.stdout.splitlines()[-1].split()
+
+        assert "birthday_reminder.app" in modules
+        for module in self.GOOGLE_ONLY_MODULES:
+            assert module not in modules
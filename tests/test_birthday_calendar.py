@@ -0,0 +1,132 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+from birthday_reminder.utils import birthday_calendar as calendar_utils
+from birthday_reminder.utils.birthday_calendar import BirthdayCalendar, BirthdayIndex, now, reference_time
+
+
+class TestBirthdayCalendar:
+    BIRTH_DATES = [date(1904, 1, 1) + timedelta(days=idx) for idx in range(366)]  # every day of a leap year
+
+    @staticmethod
+    def _celebration_date(birth_date: date, year: int, remind_29_feb_on_1_mar: bool) -> date:
+        try:
+            return birth_date.replace(year=year)
+        except ValueError:  # Feb 29 in non-leap year
+            return date(year, 3, 1) if remind_29_feb_on_1_mar else date(year, 2, 28)
+
+    @pytest.mark.parametrize("today", [date(2023, 1, 1), date(2023, 2, 28), date(2023, 3, 1), date(2024, 2, 29)])
+    @pytest.mark.parametrize("remind_29_feb_on_1_mar", [False, True])
+    def test_stats_match_reference(self, today, remind_29_feb_on_1_mar):
+        birthday_calendar = BirthdayCalendar(today, remind_29_feb_on_1_mar)
+        years = [1980 + idx % 30 for idx in range(len(self.BIRTH_DATES))]
+        stats = birthday_calendar.stats(years, [d.month for d in self.BIRTH_DATES], [d.day for d in self.BIRTH_DATES])
+
+        for idx, (year, birth_date) in enumerate(zip(years, self.BIRTH_DATES)):
+            this_year = self._celebration_date(birth_date, today.year, remind_29_feb_on_1_mar)
+            next_year = self._celebration_date(birth_date, today.year + 1, remind_29_feb_on_1_mar)
+            next_birthday = this_year if this_year > today else next_year
+
+            assert stats.ages[idx] == today.year - year - (this_year > today)
+            assert stats.days_until_next_birthday[idx] == (next_birthday - today).days
+            assert birthday_calendar.next_birthday(birth_date.month, birth_date.day) == next_birthday
+            assert birthday_calendar.is_birthday_today(birth_date.month, birth_date.day) == (this_year == today)
+
+    def test_feb_29(self):
+        for remind_29_feb_on_1_mar, celebration_date in [(False, date(2023, 2, 28)), (True, date(2023, 3, 1))]:
+            birthday_calendar = BirthdayCalendar(celebration_date, remind_29_feb_on_1_mar)
+            assert birthday_calendar.is_birthday_today(2, 29)
+            assert birthday_calendar.age(2000, 2, 29) == 23
+            assert birthday_calendar.next_birthday(2, 29) == date(2024, 2, 29)
+
+            day_before = BirthdayCalendar(celebration_date - timedelta(days=1), remind_29_feb_on_1_mar)
+            assert not day_before.is_birthday_today(2, 29)
+            assert day_before.age(2000, 2, 29) == 22
+            assert day_before.days_until_next_birthday(2, 29) == 1
+
+    def test_zodiac_index(self):
+        for birth_date in self.BIRTH_DATES:
+            (idx,) = [
+                idx
+                for idx, (_, last_day) in enumerate(calendar_utils.ZODIAC_SIGNS)
+                if (birth_date.month, birth_date.day) <= last_day
+                and (idx == 0 or (birth_date.month, birth_date.day) > calendar_utils.ZODIAC_SIGNS[idx - 1][1])
+            ]
+            assert calendar_utils.zodiac_index(birth_date.month, birth_date.day) == idx
+
+    @pytest.mark.parametrize("sort_type", list(BirthdayEvent.SortTypes))
+    def test_sort_events(self, sort_type):
+        store = EventStore(MainConfig())
+        for idx, birth_date in enumerate(self.BIRTH_DATES[::7]):
+            store.append(datetime(1950 + idx, birth_date.month, birth_date.day), f"Person {idx}", has_year=idx % 2 == 0)
+        events = list(store)
+
+        match sort_type:
+            case BirthdayEvent.SortTypes.year:
+                reference = sorted([e for e in events if e.has_year], key=lambda e: e.date)
+                reference += sorted([e for e in events if not e.has_year], key=lambda e: e.date_no_year)
+            case BirthdayEvent.SortTypes.date:
+                reference = sorted(events, key=lambda e: e.date_no_year)
+            case BirthdayEvent.SortTypes.next:
+                reference = sorted(events, key=lambda e: e.days_until_next_birthday)
+
+        assert BirthdayEvent.sort_events(events, sort_type) == reference
+        assert BirthdayEvent.sort_events(store, sort_type, store.sort_keys(sort_type)) == reference
+
+    @pytest.mark.parametrize("today", [date(2023, 2, 27), date(2023, 12, 30), date(2024, 2, 28), date(2024, 2, 29)])
+    @pytest.mark.parametrize("remind_29_feb_on_1_mar", [False, True])
+    def test_upcoming_matches_reference(self, today, remind_29_feb_on_1_mar):
+        birthday_calendar = BirthdayCalendar(today, remind_29_feb_on_1_mar)
+        birth_dates = self.BIRTH_DATES * 2  # two birthdays per bucket
+        index = BirthdayIndex([d.month for d in birth_dates], [d.day for d in birth_dates])
+
+        for n_days in [0, 1, 3, 7, 364, 365, 366, 1000]:
+            reference = []
+            for idx, birth_date in enumerate(birth_dates):
+                for year in [today.year, today.year + 1]:
+                    celebration_date = self._celebration_date(birth_date, year, remind_29_feb_on_1_mar)
+                    if today <= celebration_date <= today + timedelta(days=n_days):
+                        reference.append((celebration_date, idx))
+                        break
+            reference.sort(key=lambda pair: (pair[0], birth_dates[pair[1]], pair[1]))
+            assert index.upcoming(birthday_calendar, n_days) == reference
+
+    def test_upcoming_store(self):
+        store = EventStore(MainConfig())
+        store.append(datetime(2000, 1, 2), "Ivan", has_year=True)
+        store.append(datetime(1904, 12, 31), "Anna", has_year=False)
+        with reference_time(datetime(2023, 12, 30)):
+            assert [(d, e.title) for d, e in store.upcoming(3)] == [
+                (date(2023, 12, 31), "Anna"),
+                (date(2024, 1, 2), "Ivan"),
+            ]
+
+            # index is rebuilt after append
+            store.append(datetime(1990, 12, 30), "Petr", has_year=True)
+            assert [e.title for _, e in store.upcoming(1)] == ["Petr", "Anna"]
+
+    def test_sorted_order(self):
+        assert calendar_utils.sorted_order([3, 1, 2, 1, 0]) == [4, 1, 3, 2, 0]
+        assert calendar_utils.sorted_order([]) == []
+
+    def test_reference_time(self):
+        event = BirthdayEvent(datetime(2000, 6, 15), "Ivan", has_year=True, config=MainConfig())
+
+        with reference_time(datetime(2023, 6, 14, 23, 59, 59)):
+            assert now() == datetime(2023, 6, 14, 23, 59, 59)
+            assert event.age == 22
+            assert event.days_until_next_birthday == 1
+            assert not event.is_birthday_today
+
+        with reference_time(datetime(2023, 6, 15)):
+            assert event.age == 23
+            assert event.is_birthday_today
+            assert event.next_birthday == datetime(2024, 6, 15)
+
+        with reference_time() as time:
+            assert now() == time
+            assert now() == time  # doesn't change inside the block
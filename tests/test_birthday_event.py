@@ -3,7 +3,8 @@ from datetime import datetime
 import pytest
 from dateutil.relativedelta import relativedelta
 
-from birthday_reminder.birthday_event import BirthdayEvent, compare_events_file_and_google
+from birthday_reminder import birthday_event
+from birthday_reminder.birthday_event import BirthdayEvent, compare_events_file_and_google, find_duplicates
 from birthday_reminder.configs.main_config import MainConfig
 
 
@@ -119,6 +120,80 @@ class TestBirthdayEvent:
         new_event = BirthdayEvent.from_google_event(google_event)
         assert event == new_event
 
+    def test_stored_content_hash(self):
+        config = MainConfig()
+        event = BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=config)
+        google_event = event.to_google_event()
+        assert google_event["extendedProperties"]["private"] == {"birthdayReminderContentHash": event.content_hash}
+
+        uploaded = BirthdayEvent.from_google_event(google_event)
+        assert uploaded == event
+        assert uploaded._stored_content_hash == uploaded.content_hash
+
+        # event that is not edited since upload is compared by the stored hash, its signature is not built
+        trusted = BirthdayEvent.from_google_event(google_event)
+        trusted.trust_stored_content_hash()
+        assert trusted == event
+        assert "google_event_signature_str" not in trusted._cache
+
+        # events uploaded before the hash was stored are compared structurally
+        legacy_event = {k: v for k, v in google_event.items() if k != "extendedProperties"}
+        legacy = BirthdayEvent.from_google_event(legacy_event)
+        assert legacy == event
+        assert legacy.content_hash == uploaded.content_hash
+
+        config.email_reminders_minutes = [60]
+        assert uploaded != event
+        assert legacy != event
+
+    def test_manually_edited_event(self):
+        event = BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=MainConfig())
+        google_event = event.to_google_event()
+        google_event["reminders"] = {"useDefault": False, "overrides": [{"method": "popup", "minutes": 5}]}
+
+        # stored hash is left as it was on upload, but the event differs from the file
+        edited = BirthdayEvent.from_google_event(google_event)
+        assert edited._stored_content_hash == event.content_hash
+        assert edited.content_hash != event.content_hash
+        assert edited != event
+        assert set(event.google_event_patch(edited)) == {"reminders"}
+
+    def test_google_event_patch(self):
+        config = MainConfig()
+        event = BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=config)
+        google_event = BirthdayEvent.from_google_event(event.to_google_event())
+        assert event.google_event_patch(google_event) == {}
+
+        config.email_reminders_minutes = [60]
+        patch = event.google_event_patch(google_event)
+        assert set(patch) == {"reminders", "extendedProperties"}
+        assert patch["reminders"] == event.to_google_event()["reminders"]
+
+        # only id and summary are known about events from upload journal
+        journal_event = BirthdayEvent.from_google_event(
+            {"id": "1", "summary": "🎁 Ivan", "start": {"date": "2020-01-01"}}
+        )
+        assert set(event.google_event_patch(journal_event)) == set(event.to_google_event())
+
+    def test_signature_cache_is_invalidated(self):
+        config = MainConfig()
+        event = BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=config)
+        google_event = BirthdayEvent.from_google_event(event.to_google_event())
+        content_hash = event.content_hash
+        assert event == google_event
+
+        config.popup_reminders_minutes = [30]
+        assert event != google_event
+        assert event.content_hash != content_hash
+
+        config.popup_reminders_minutes = MainConfig().popup_reminders_minutes
+        assert event == google_event
+        assert event.content_hash == content_hash
+
+        event.title = "Petr"
+        assert event != google_event
+        assert hash(event) != hash(google_event)
+
     def test_compare_events_file_and_google(self):
         file_events = [
             BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=MainConfig()),
@@ -149,3 +224,41 @@ class TestBirthdayEvent:
         assert list(cmp_result.google_only_events)[0] == google_events[2]
         assert list(cmp_result.equal_events)[0] == file_events[0] == google_events[0]
         assert list(cmp_result.updated_events)[0] in [file_events[1], google_events[1]]
+
+        assert cmp_result.events_to_create == [file_events[2]]
+        assert cmp_result.events_to_delete == [google_events[2]]
+        assert len(cmp_result.updated_pairs) == 1
+        assert cmp_result.updated_pairs[0][0] is file_events[1]
+        assert cmp_result.updated_pairs[0][1] is google_events[1]
+
+    def test_compare_same_signature_leftovers(self):
+        file_events = [BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=MainConfig())]
+        config2 = MainConfig()
+        config2.popup_reminders_minutes = [30]
+        event2 = BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=config2)
+
+        # one of the events with the same signature is equal, another one is a leftover
+        google_events = [BirthdayEvent.from_google_event(e.to_google_event()) for e in [event2, file_events[0]]]
+        cmp_result = compare_events_file_and_google(file_events, google_events)
+        assert cmp_result.equal_events == {file_events[0]}
+        assert cmp_result.updated_pairs == []
+        assert cmp_result.events_to_delete == [google_events[0]]
+
+        # none of them is equal: it's unknown which one to update
+        config3 = MainConfig()
+        config3.popup_reminders_minutes = [40]
+        file_events[0].config = config3
+        with pytest.raises(birthday_event.DuplicateEventsError, match="updating is not possible"):
+            compare_events_file_and_google(file_events, google_events)
+
+    def test_find_duplicates(self):
+        assert find_duplicates([1, 2, 3]) == []
+        assert find_duplicates([1, 2, 1, 3, 2, 1]) == [[1, 1, 1], [2, 2]]
+        assert find_duplicates(["a", "B", "b", "A", "c"], key=str.lower) == [["a", "A"], ["B", "b"]]
+
+    def test_compare_google_duplicates(self):
+        file_events = [BirthdayEvent(date=datetime(2020, 1, 1), title="Ivan", has_year=True, config=MainConfig())]
+        google_events = [BirthdayEvent.from_google_event(file_events[0].to_google_event()) for _ in range(2)]
+
+        with pytest.raises(birthday_event.DuplicateEventsError, match="Google Calendar contains duplicates"):
+            compare_events_file_and_google(file_events, google_events)
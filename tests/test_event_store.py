@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.event_store import EventStore
+
+
+class TestEventStore:
+    @staticmethod
+    def _make_store() -> EventStore:
+        store = EventStore(MainConfig())
+        store.append(datetime(2001, 1, 2), "Ivan", has_year=True)
+        store.append(datetime(1904, 2, 29), "Anna", has_year=False)
+        store.append(datetime(1990, 12, 31), "Ivan", has_year=True)
+        return store
+
+    def test_views(self):
+        store = self._make_store()
+        reference = [
+            BirthdayEvent(datetime(2001, 1, 2), "Ivan", has_year=True, config=store.config),
+            BirthdayEvent(datetime(1904, 2, 29), "Anna", has_year=False, config=store.config),
+            BirthdayEvent(datetime(1990, 12, 31), "Ivan", has_year=True, config=store.config),
+        ]
+
+        assert len(store) == 3
+        assert list(store) == reference
+        assert store[1] == reference[1]
+        assert store[-1] == reference[2]
+        assert store[1:] == reference[1:]
+        assert store[0].config is store.config
+        with pytest.raises(IndexError):
+            store[3]
+
+    def test_titles_are_interned(self):
+        store = self._make_store()
+        assert store._titles == ["Ivan", "Anna"]
+        assert store[0].title is store[2].title
+
+    def test_has_duplicates(self):
+        store = self._make_store()
+        assert not store.has_duplicates()
+
+        # the same day and title, but without year is a different event
+        store.append(datetime(2001, 1, 2), "Ivan", has_year=False)
+        assert not store.has_duplicates()
+
+        store.append(datetime(1990, 12, 31), "Ivan", has_year=True)
+        assert store.has_duplicates()
+
+    def test_to_from_bytes(self):
+        store = self._make_store()
+        restored = EventStore.from_bytes(store.config, store.to_bytes())
+        assert list(restored) == list(store)
+        restored.append(datetime(2001, 1, 2), "Anna", has_year=True)
+        assert restored._title_ids_by_title == {"Ivan": 0, "Anna": 1}
+        assert restored[-1].title is restored[1].title
+
+        empty = EventStore(store.config)
+        assert len(EventStore.from_bytes(store.config, empty.to_bytes())) == 0
+        with pytest.raises(ValueError):
+            EventStore.from_bytes(store.config, store.to_bytes()[:-10])
+        with pytest.raises(ValueError):
+            EventStore.from_bytes(store.config, store.to_bytes()[: EventStore._HEADER.size - 1])
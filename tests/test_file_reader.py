@@ -4,7 +4,7 @@ import pytest
 
 from birthday_reminder.birthday_event import BirthdayEvent
 from birthday_reminder.configs.main_config import MainConfig
-from birthday_reminder.drivers.file_reader import FileReader
+from birthday_reminder.drivers.file_reader import BirthdayLine, FileReader, ParseError, TextLine
 
 
 class TestFileReader:
@@ -158,3 +158,117 @@ class TestFileReader:
             config = self._get_verbose_config()
             config.input_file = utils.test_resource("birthdays_errors.txt")
             FileReader(config=config)
+
+    @pytest.mark.parametrize("year", [None, 1, 1900, 1904, 2000, 2023, 2024, 9999])
+    def test_parse_date_fast_matches_strptime(self, year):
+        for month in range(0, 14):
+            for day in range(0, 33):
+                for date_str in [f"{month:02}-{day:02}", f"{month}-{day}"]:
+                    if year is not None:
+                        date_str = f"{year:04}-{date_str}"
+                    try:
+                        reference = (datetime.strptime(date_str, "%Y-%m-%d"), True)
+                    except ValueError:
+                        try:
+                            reference = (datetime.strptime(f"1904-{date_str}", "%Y-%m-%d"), False)
+                        except ValueError:
+                            reference = None
+                    assert FileReader._parse_date_fast(date_str) == reference, date_str
+
+    def test_parse_lines_is_lazy(self):
+        def lines():
+            yield "2001-01-01 Ivan\n"
+            yield "# comment\n"
+            yield "Ivan\n"
+            raise AssertionError("Only needed lines must be read")
+
+        parsed = FileReader._parse_lines(MainConfig(), lines())
+        assert type(next(parsed)) is BirthdayLine
+        assert type(next(parsed)) is TextLine
+        error = next(parsed)
+        assert type(error) is ParseError
+        assert error.line_idx == 2
+
+    def test_parallel_parsing_matches_serial(self, tmpdir, utils, monkeypatch):
+        with open(utils.test_resource("birthdays_errors.txt"), encoding="utf-8") as f:
+            text = f.read()
+        filepath = tmpdir.join("big_file.txt")
+        # CRLF and CR line ends and non-ASCII chars must not break chunks
+        filepath.write_binary((text * 5 + "2001-01-01 Иван\r\n03-04 Анна\r05-06 Петр").encode("utf-8"))
+
+        config = MainConfig()
+        config.input_file = str(filepath)
+        serial_lines = list(FileReader.parse_file(config))
+
+        monkeypatch.setattr(FileReader, "_CHUNK_BYTES", 16)
+        config.parse_workers = 3
+        assert len(FileReader._split_to_chunks(config.input_file)) > 10
+        parallel_lines = list(FileReader.parse_file(config))
+
+        assert parallel_lines == serial_lines
+        assert [line.line_idx for line in parallel_lines] == list(range(len(serial_lines)))
+
+    def test_duplicates(self, tmpdir):
+        filepath = tmpdir.join("duplicates_file.txt")
+        filepath.write(
+            "2001-01-01 Ivan\n"
+            "02-03 Petr\n"
+            "2001-01-01 Ivan  # same event\n"
+            "03-04 Anna\n"
+            "02-03   Petr\n"
+            "2001-01-01 Ivan\n"
+        )
+
+        config = self._get_verbose_config()
+        config.input_file = filepath
+        with pytest.raises(ValueError) as e:
+            FileReader(config=config)
+
+        message = str(e.value)
+        assert "2 groups of duplicate events" in message
+        assert message.endswith(
+            "0: 2001-01-01 Ivan\n"
+            "2: 2001-01-01 Ivan  # same event\n"
+            "5: 2001-01-01 Ivan\n"
+            "---\n"
+            "1: 02-03 Petr\n"
+            "4: 02-03   Petr"
+        )
+        assert "Anna" not in message
+
+    def test_cache(self, tmpdir, monkeypatch):
+        filepath = tmpdir.join("cached_file.txt")
+        filepath.write("2001-01-01 Ivan\n02-03 Petr\n")
+        config = MainConfig()
+        config.input_file = str(filepath)
+        config.cache_dir = str(tmpdir.join("cache"))
+        reference = list(FileReader(config).events)
+        (cache_file,) = tmpdir.join("cache").listdir()
+
+        def parse_file_fields(*args):
+            raise AssertionError("File must not be parsed")
+
+        with monkeypatch.context() as m:
+            m.setattr(FileReader, "_parse_file_fields", parse_file_fields)
+            assert list(FileReader(config).events) == reference
+
+            # display title changed, events depend on config
+            config.title_prefix = "🎂 "
+            with pytest.raises(AssertionError, match="must not be parsed"):
+                FileReader(config)
+            config.title_prefix = MainConfig().title_prefix
+            assert list(FileReader(config).events) == reference
+
+        # file changed
+        filepath.write("2001-01-01 Ivan\n02-03 Anna\n")
+        assert [e.title for e in FileReader(config).events] == ["Ivan", "Anna"]
+
+        # corrupted cache is ignored and rewritten
+        cache_file.write_binary(cache_file.read_binary()[:-10])
+        assert [e.title for e in FileReader(config).events] == ["Ivan", "Anna"]
+        key_line = cache_file.read_binary().split(b"\n")[0] + b"\n"
+        cache_file.write_binary(key_line + b"\0\0")  # truncated header
+        assert [e.title for e in FileReader(config).events] == ["Ivan", "Anna"]
+        with monkeypatch.context() as m:
+            m.setattr(FileReader, "_parse_file_fields", parse_file_fields)
+            assert [e.title for e in FileReader(config).events] == ["Ivan", "Anna"]
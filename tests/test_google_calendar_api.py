@@ -0,0 +1,351 @@
+import json
+from datetime import datetime
+
+import pytest
+from fake_google_calendar import FakeCalendarHttp
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.google_calendar_api import GoogleCalendarApi
+
+
+class TestGoogleCalendarApi:
+    @staticmethod
+    def _make_file_events(config, n):
+        return [
+            BirthdayEvent(date=datetime(1950 + idx // 365, 1, 1), title=f"Ivan {idx}", has_year=True, config=config)
+            for idx in range(n)
+        ]
+
+    @staticmethod
+    def _stored_events(events: list[BirthdayEvent]) -> list[dict]:
+        """Events as they are stored in Google Calendar"""
+        stored_events = [event.google_event for event in events if event.google_event is not None]
+        assert len(stored_events) == len(events)
+        return stored_events
+
+    @staticmethod
+    def _make_config(use_batch_requests, workers=1):
+        config = MainConfig()
+        config.use_batch_requests = use_batch_requests
+        config.workers = workers
+        config.qps = 1000.0
+        return config
+
+    def test_creates_calendar(self, fake_http):
+        gc_api = GoogleCalendarApi(MainConfig(), http=fake_http)
+        assert gc_api.br_calendar["summary"] == "Birthday Reminder"
+        assert gc_api.get_events() == []
+
+    def test_calendar_id_and_discovery_are_cached(self, fake_http, monkeypatch):
+        config = MainConfig()
+        br_calendar = GoogleCalendarApi(config, http=fake_http).br_calendar
+        assert fake_http.count_sub_requests("GET", "/calendarList") == 1
+
+        # the next run makes only the request it needs
+        monkeypatch.setattr("birthday_reminder.drivers.google_calendar_api.discovery_cache.get_static_doc", None)
+        fake_http.sub_requests.clear()
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        assert gc_api.br_calendar == {"id": br_calendar["id"], "summary": "Birthday Reminder"}
+        assert gc_api.get_events() == []
+        assert [method for method, _ in fake_http.sub_requests] == ["GET"]
+        assert fake_http.count_sub_requests("GET", "/events") == 1
+
+        # calendar was deleted manually
+        del fake_http.calendars[br_calendar["id"]]
+        del fake_http.events[br_calendar["id"]]
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        assert gc_api.get_events() == []
+        assert gc_api.br_calendar["id"] != br_calendar["id"]
+        assert GoogleCalendarApi(config, http=fake_http).br_calendar["id"] == gc_api.br_calendar["id"]
+
+        # expired
+        config.calendar_id_ttl_hours = 0
+        calls = fake_http.count_sub_requests("GET", "/calendarList")
+        GoogleCalendarApi(config, http=fake_http)
+        assert fake_http.count_sub_requests("GET", "/calendarList") == calls + 1
+
+    def test_recreate_br_calendar(self, fake_http):
+        config = self._make_config(True)
+        config.use_incremental_sync = True
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        old_id = gc_api.br_calendar["id"]
+        fake_http.calendars[old_id].update(timeZone="Europe/Moscow", colorId="7", accessRole="owner")
+        gc_api.create_events(self._make_file_events(config, 120))
+        assert len(gc_api.get_events()) == 120
+
+        fake_http.sub_requests.clear()
+        gc_api.recreate_br_calendar()
+        assert len(fake_http.sub_requests) == 5
+        assert old_id not in fake_http.calendars
+        assert fake_http.calendars[gc_api.br_calendar["id"]] == {
+            "id": gc_api.br_calendar["id"],
+            "summary": "Birthday Reminder",
+            "timeZone": "Europe/Moscow",
+            "colorId": "7",
+        }
+        assert gc_api.get_events() == []
+
+        # the next run takes the new calendar from cache
+        fake_http.sub_requests.clear()
+        assert GoogleCalendarApi(config, http=fake_http).br_calendar["id"] == gc_api.br_calendar["id"]
+        assert fake_http.sub_requests == []
+
+    def test_calendar_is_found_on_any_page(self, fake_http):
+        calendars = [fake_http.add_calendar(f"Other {idx}") for idx in range(600)]
+        br_calendar = fake_http.add_calendar("Birthday Reminder")
+
+        config = MainConfig()
+        assert GoogleCalendarApi(config, http=fake_http).br_calendar["id"] == br_calendar["id"]
+        assert fake_http.count_sub_requests("GET", "/calendarList") == 3  # 250 calendars per page
+        assert fake_http.count_sub_requests("POST", "/calendars") == 0
+
+        # all names are remembered
+        config.calendar_name = "Other 300"
+        assert GoogleCalendarApi(config, http=fake_http).br_calendar["id"] == calendars[300]["id"]
+        assert fake_http.count_sub_requests("GET", "/calendarList") == 3
+
+    def test_ambiguous_calendar_name(self, fake_http):
+        fake_http.add_calendar("Birthday Reminder")
+        fake_http.add_calendar("Other")
+        fake_http.add_calendar("Birthday Reminder")
+
+        with pytest.raises(Exception, match="There are 2 calendars named 'Birthday Reminder'"):
+            GoogleCalendarApi(MainConfig(), http=fake_http)
+        assert fake_http.count_sub_requests("POST", "/calendars") == 0
+
+    def test_events_are_listed_with_fields_mask(self, fake_http, utils):
+        config = self._make_config(False)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        gc_api.create_events(self._make_file_events(config, 3))
+
+        google_events = gc_api._get_all_events()
+        assert fake_http.list_queries[-1]["showDeleted"] == ["false"]
+        assert {key for event in google_events for key in event} == {
+            "id",
+            "summary",
+            "description",
+            "start",
+            "end",
+            "recurrence",
+            "reminders",
+            "extendedProperties",
+            "status",
+            "etag",
+        }
+
+        # the mask keeps everything that events are compared by
+        with open(utils.test_resource("google_events_list.json"), encoding="utf-8") as f:
+            response = json.load(f)
+        masked_response = FakeCalendarHttp.select_fields(
+            response, FakeCalendarHttp._parse_fields(GoogleCalendarApi._LIST_FIELDS)
+        )
+        assert set(masked_response) == {"items", "nextSyncToken"}
+        for full, masked in zip(response["items"], masked_response["items"]):
+            full_event = BirthdayEvent.from_google_event(full)
+            masked_event = BirthdayEvent.from_google_event(masked)
+            assert masked_event == full_event
+            assert masked_event.content_hash == full_event.content_hash
+            assert masked_event.is_manually_created_google_event == full_event.is_manually_created_google_event
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_create_update_delete(self, fake_http, use_batch_requests, workers):
+        config = self._make_config(use_batch_requests, workers)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+
+        file_events = self._make_file_events(config, 120)
+        outcomes = gc_api.create_events(file_events)
+        assert all(o.status == GoogleCalendarApi.EventStatuses.DONE for o in outcomes)
+        assert [o.response and o.response["summary"] for o in outcomes] == [e.display_title for e in file_events]
+
+        google_events = gc_api.get_events()
+        assert sorted(google_events, key=lambda e: e.title) == sorted(file_events, key=lambda e: e.title)
+        google_events = [next(g for g in google_events if g.title == e.display_title) for e in file_events]
+
+        config.popup_reminders_minutes = [30]
+        outcomes = gc_api.update_events(file_events, google_events)
+        assert len(outcomes) == len(file_events)
+        assert len(set(gc_api.get_events()) & set(file_events)) == len(file_events)
+
+        gc_api.delete_events(gc_api.get_events())
+        assert gc_api.get_events() == []
+
+        api_calls = fake_http.count_sub_requests("POST", "/events")
+        if use_batch_requests:
+            assert fake_http.requests.count(("POST", "/batch/calendar/v3")) == 3 * 3  # 3 actions, 120 / 50 batches
+        else:
+            assert fake_http.requests.count(("POST", "/batch/calendar/v3")) == 0
+            assert api_calls == 120
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    def test_update_sends_only_changed_fields(self, fake_http, use_batch_requests):
+        config = self._make_config(use_batch_requests)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        file_events = self._make_file_events(config, 10)
+        gc_api.create_events(file_events)
+        created_bytes = gc_api.bytes_sent
+        google_events = sorted(gc_api.get_events(), key=lambda e: e.title)
+        descriptions = [e["description"] for e in self._stored_events(google_events)]
+
+        config.popup_reminders_minutes = [30]
+        outcomes = gc_api.update_events(file_events, google_events)
+        assert [set(o.google_event) for o in outcomes] == [{"id", "reminders", "extendedProperties"}] * 10
+        assert fake_http.count_sub_requests("PATCH", "/events") == 10
+        assert gc_api.bytes_sent - created_bytes < created_bytes / 2
+
+        google_events = sorted(gc_api.get_events(), key=lambda e: e.title)
+        assert google_events == file_events
+        assert [e["description"] for e in self._stored_events(google_events)] == descriptions
+
+        # 'date' is cleared, when event gets time
+        config.use_time = True
+        gc_api.update_events(file_events, google_events)
+        google_events = sorted(gc_api.get_events(), key=lambda e: e.title)
+        assert google_events == file_events
+        assert all("date" not in e["start"] for e in self._stored_events(google_events))
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    def test_send_events_with_ids(self, fake_http, use_batch_requests):
+        config = self._make_config(use_batch_requests, workers=2)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        new_events = [
+            dict(e.to_google_event(), id=f"id{idx:08d}") for idx, e in enumerate(self._make_file_events(config, 8))
+        ]
+
+        sent: list[dict] = []
+        done: list[GoogleCalendarApi.EventOutcome] = []
+        outcomes = gc_api.send_events(
+            new_events, GoogleCalendarApi.EventActions.CREATE, on_done=done.extend, on_sent=sent.extend
+        )
+        assert sorted(e["id"] for e in sent) == [e["id"] for e in new_events]
+        assert sorted(o.google_event["id"] for o in done) == [e["id"] for e in new_events]
+        assert all(o.status == GoogleCalendarApi.EventStatuses.DONE for o in outcomes)
+
+        # repeated create of the same events
+        outcomes = gc_api.send_events(new_events, GoogleCalendarApi.EventActions.CREATE)
+        assert all(o.status == GoogleCalendarApi.EventStatuses.EXISTS for o in outcomes)
+        assert sorted(e["id"] for e in self._stored_events(gc_api.get_events())) == [e["id"] for e in new_events]
+
+    def test_estimate_cost(self, fake_http):
+        counts = {"DELETE": 0, "PATCH": 51, "CREATE": 120}
+        config = self._make_config(False)
+        config.qps = 10.0
+        assert GoogleCalendarApi(config, http=fake_http).estimate_cost(counts) == dict(
+            api_calls=171, http_requests=171, seconds=17.1
+        )
+
+        config.use_batch_requests = True
+        assert GoogleCalendarApi(config, http=fake_http).estimate_cost(counts)["http_requests"] == 2 + 3
+
+    def test_batch_retries_failed_sub_requests_only(self, fake_http):
+        config = self._make_config(True)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+
+        fake_http.fail(503, times=3, method="POST", path_contains="/events")
+        outcomes = gc_api.create_events(self._make_file_events(config, 10))
+
+        assert len(outcomes) == 10
+        assert all(o.status == GoogleCalendarApi.EventStatuses.DONE for o in outcomes)
+        assert fake_http.count_sub_requests("POST", "/events") == 10 + 3
+        assert len(gc_api.get_events()) == 10
+
+    def test_batch_gives_up_after_retries(self, fake_http):
+        config = self._make_config(True)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+
+        fake_http.fail(500, times=1000, method="POST", path_contains="/events")
+        with pytest.raises(Exception, match="Failed to create 2 events"):
+            gc_api.create_events(self._make_file_events(config, 2))
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    def test_gone_events_are_reported(self, fake_http, use_batch_requests):
+        config = self._make_config(use_batch_requests)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        gc_api.create_events(self._make_file_events(config, 3))
+
+        google_events = gc_api.get_events()
+        gone_event_id = google_events[1].google_event and google_events[1].google_event["id"]
+        fake_http.fail(410, method="DELETE", path_contains=gone_event_id)
+        outcomes = gc_api.delete_events(google_events)
+
+        assert [o.status for o in outcomes] == [
+            GoogleCalendarApi.EventStatuses.DONE,
+            GoogleCalendarApi.EventStatuses.GONE,
+            GoogleCalendarApi.EventStatuses.DONE,
+        ]
+
+    @pytest.mark.parametrize("use_batch_requests", [False, True])
+    def test_rate_limit_errors_pause_all_workers(self, fake_http, monkeypatch, use_batch_requests):
+        config = self._make_config(use_batch_requests, workers=4)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+
+        pauses: list[float] = []
+
+        def back_off():
+            pauses.append(0.0)
+            return 0.0
+
+        monkeypatch.setattr(gc_api._rate_limiter, "back_off", back_off)
+        sleeps: list[float] = []
+        monkeypatch.setattr("birthday_reminder.drivers.google_calendar_api.time.sleep", sleeps.append)
+
+        fake_http.fail(429, times=2, method="POST", path_contains="/events")
+        fake_http.fail(403, times=1, method="POST", path_contains="/events")
+        outcomes = gc_api.create_events(self._make_file_events(config, 20))
+
+        assert len(outcomes) == 20
+        assert len(pauses) == (1 if use_batch_requests else 3)  # failed sub-requests of a batch are retried together
+        assert sleeps == []  # no per-worker delays for quota errors
+        assert len(gc_api.get_events()) == 20
+
+    def test_rate_limited_sub_request_pauses_batch(self, fake_http, monkeypatch):
+        config = self._make_config(use_batch_requests=True)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        pauses: list[float] = []
+
+        def back_off():
+            pauses.append(0.0)
+            return 0.0
+
+        monkeypatch.setattr(gc_api._rate_limiter, "back_off", back_off)
+        sleeps: list[float] = []
+        monkeypatch.setattr("birthday_reminder.drivers.google_calendar_api.time.sleep", sleeps.append)
+
+        # the first failed sub-request is not rate limited, a later one is
+        fake_http.fail(500, times=1, method="POST", path_contains="/events")
+        fake_http.fail(429, times=1, method="POST", path_contains="/events", skip=1)
+        gc_api.create_events(self._make_file_events(config, 5))
+
+        assert len(pauses) == 1
+        assert sleeps == []
+        assert len(gc_api.get_events()) == 5
+
+    def test_incremental_sync(self, fake_http, tmpdir):
+        config = self._make_config(False)
+        config.use_incremental_sync = True
+        config.cache_dir = str(tmpdir)
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        gc_api.create_events(self._make_file_events(config, 5))
+
+        assert len(gc_api.get_events()) == 5
+        assert "syncToken" not in fake_http.list_queries[-1]
+
+        assert len(gc_api.get_events()) == 5
+        assert "syncToken" in fake_http.list_queries[-1]
+
+        # changes are merged into the snapshot, which persists between runs
+        gc_api.delete_events(gc_api.get_events()[:2])
+        gc_api.create_events(self._make_file_events(config, 8)[5:])
+        gc_api = GoogleCalendarApi(config, http=fake_http)
+        google_events = gc_api.get_events()
+        assert "syncToken" in fake_http.list_queries[-1]
+        assert sorted(e.title for e in google_events) == [f"🎁 Ivan {idx}" for idx in range(2, 8)]
+
+        # expired token leads to full sync
+        fake_http.invalidate_sync_tokens()
+        assert gc_api.get_events() == google_events
+        assert "syncToken" in fake_http.list_queries[-2]
+        assert "syncToken" not in fake_http.list_queries[-1]
+        assert gc_api.get_events() == google_events
+        assert "syncToken" in fake_http.list_queries[-1]
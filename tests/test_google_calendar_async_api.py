@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+from fake_google_calendar import FakeCalendarServer
+
+from birthday_reminder.birthday_event import BirthdayEvent
+from birthday_reminder.configs.main_config import MainConfig
+from birthday_reminder.drivers.google_calendar_async_api import AsyncGoogleCalendarApi
+
+
+class TestAsyncGoogleCalendarApi:
+    @staticmethod
+    def _make_config(workers):
+        config = MainConfig()
+        config.workers = workers
+        config.qps = 1000.0
+        return config
+
+    @pytest.fixture
+    def server(self, fake_http, monkeypatch):
+        monkeypatch.setattr(AsyncGoogleCalendarApi, "_DELAYS", [0] * 8)
+        with FakeCalendarServer(fake_http) as server:
+            yield server
+
+    def test_create_update_delete(self, server):
+        config = self._make_config(workers=4)
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        assert gc_api.br_calendar["summary"] == "Birthday Reminder"
+
+        file_events = [
+            BirthdayEvent(date=datetime(2000, 1, 1 + idx), title=f"Ivan {idx}", has_year=True, config=config)
+            for idx in range(20)
+        ]
+        server.client_ports.clear()
+        outcomes = gc_api.create_events(file_events)
+        assert [o.response and o.response["summary"] for o in outcomes] == [e.display_title for e in file_events]
+        assert len(server.client_ports) <= config.workers  # connections are kept alive and reused
+
+        google_events = sorted(gc_api.get_events(), key=lambda e: e.date)
+        assert google_events == file_events
+
+        config.popup_reminders_minutes = [30]
+        gc_api.update_events(file_events, google_events)
+        assert sorted(gc_api.get_events(), key=lambda e: e.date) == file_events
+
+        gc_api.delete_events(google_events)
+        assert gc_api.get_events() == []
+
+    def test_send_events_with_ids(self, server):
+        config = self._make_config(workers=2)
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        event = BirthdayEvent(date=datetime(2000, 1, 1), title="Ivan", has_year=True, config=config)
+        new_event = dict(event.to_google_event(), id="0123456789abcdef")
+
+        sent: list[dict] = []
+        done: list[AsyncGoogleCalendarApi.EventOutcome] = []
+        outcomes = gc_api.send_events([new_event], gc_api.EventActions.CREATE, on_done=done.extend, on_sent=sent.extend)
+        assert sent == [new_event]
+        assert done == outcomes and outcomes[0].status == gc_api.EventStatuses.DONE
+
+        # repeated create of the same event
+        outcomes = gc_api.send_events([new_event], gc_api.EventActions.CREATE)
+        assert outcomes[0].status == gc_api.EventStatuses.EXISTS
+        assert len(gc_api.get_events()) == 1
+
+    def test_recreate_br_calendar(self, server, fake_http):
+        gc_api = AsyncGoogleCalendarApi(self._make_config(workers=1), base_url=server.url, token="test")
+        old_id = gc_api.br_calendar["id"]
+        fake_http.calendars[old_id]["colorId"] = "7"
+        fake_http.add_event(old_id, {"summary": "Ivan", "start": {"date": "2000-01-01"}})
+
+        gc_api.recreate_br_calendar()
+        assert old_id not in fake_http.calendars
+        assert fake_http.calendars[gc_api.br_calendar["id"]]["colorId"] == "7"
+        assert gc_api.get_events() == []
+
+    def test_paging(self, server, fake_http, monkeypatch):
+        config = self._make_config(workers=1)
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        monkeypatch.setattr(gc_api, "_LIST_PARAMS", dict(singleEvents=False, maxResults=3))
+        for idx in range(10):
+            fake_http.add_event(gc_api.br_calendar["id"], {"summary": f"Ivan {idx}", "start": {"date": "2000-01-01"}})
+
+        assert len(gc_api.get_events()) == 10
+        assert fake_http.count_sub_requests("GET", "/events") == 4
+
+        # list of calendars is paged too
+        for idx in range(300):
+            fake_http.add_calendar(f"Other {idx}")
+        config.calendar_name = "Other 299"
+        calls = fake_http.count_sub_requests("GET", "/calendarList")
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        assert gc_api.br_calendar["summary"] == "Other 299"
+        assert fake_http.count_sub_requests("GET", "/calendarList") == calls + 2
+
+    def test_retries(self, server, fake_http):
+        config = self._make_config(workers=2)
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        file_events = [BirthdayEvent(date=datetime(2000, 1, 1), title="Ivan", has_year=True, config=config)]
+
+        fake_http.fail(429, times=2, method="POST", path_contains="/events")
+        outcomes = gc_api.create_events(file_events)
+        assert outcomes[0].status == AsyncGoogleCalendarApi.EventStatuses.DONE
+
+        google_events = gc_api.get_events()
+        fake_http.fail(410, method="DELETE")
+        outcomes = gc_api.delete_events(google_events)
+        assert outcomes[0].status == AsyncGoogleCalendarApi.EventStatuses.GONE
+
+    def test_incremental_sync(self, server, fake_http, tmpdir):
+        config = self._make_config(workers=1)
+        config.use_incremental_sync = True
+        config.cache_dir = str(tmpdir)
+        gc_api = AsyncGoogleCalendarApi(config, base_url=server.url, token="test")
+        fake_http.add_event(gc_api.br_calendar["id"], {"summary": "Ivan", "start": {"date": "2000-01-01"}})
+
+        assert len(gc_api.get_events()) == 1
+        fake_http.add_event(gc_api.br_calendar["id"], {"summary": "Ivan 2", "start": {"date": "2000-01-02"}})
+        fake_http.invalidate_sync_tokens()
+        assert len(gc_api.get_events()) == 2
+        assert "syncToken" in fake_http.list_queries[-2]
+        assert "syncToken" not in fake_http.list_queries[-1]
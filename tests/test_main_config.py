@@ -20,16 +20,21 @@ class TestMainConfig:
 
         config = MainConfig()
         code_config = config.get_public_vars()
-        del code_config["input_file"]  # it's not in the file because we can't set absolute path dynamically in yaml
+        # they are not in the file because we can't set absolute path dynamically in yaml
+        del code_config["input_file"]
+        del code_config["cache_dir"]
         assert file_config == code_config
 
     CONFIG_YAML_STR = """
         input_file: "Birthdays.txt"
+        cache_dir: "cache"
         use_zodiac_signs: true
         use_zodiac_names: true
         title_prefix: "Birthday of "
         title_postfix: " 🎂"
         calendar_name: "Birthdays"
+        calendar_id_ttl_hours: 1
+        recreate_calendar_on_force: true
         google_oauth_port: 1025
         use_time: true
         time_zone: "Europe/Moscow"
@@ -38,6 +43,12 @@ class TestMainConfig:
         remind_29_feb_on_1_mar: true
         popup_reminders_minutes: [10, 30]
         email_reminders_minutes: [60, 1440]
+        parse_workers: 2
+        use_batch_requests: true
+        workers: 4
+        qps: 2.5
+        use_async_driver: true
+        use_incremental_sync: true
         verbose: 0
         """
 
@@ -0,0 +1,58 @@
+import pytest
+
+from birthday_reminder.utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter:
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr("birthday_reminder.utils.rate_limiter.time", clock)
+        return clock
+
+    def test_limits_rate(self, clock):
+        limiter = RateLimiter(qps=10, delays=[1, 2, 4])
+        start = clock.now
+        for _ in range(110):
+            limiter.acquire()
+        # first 10 requests are a burst, the rest are spaced by 0.1 seconds
+        assert clock.now - start == pytest.approx(10.0)
+
+    def test_acquire_many_tokens(self, clock):
+        limiter = RateLimiter(qps=10, delays=[1, 2, 4])
+        start = clock.now
+        limiter.acquire(50)
+        limiter.acquire(50)
+        assert clock.now - start == pytest.approx(9.0)
+
+    def test_back_off_escalates_and_resets(self, clock):
+        limiter = RateLimiter(qps=1000, delays=[1, 2, 4])
+
+        assert limiter.back_off() == 1
+        clock.now += 0.5
+        assert limiter.back_off() == pytest.approx(0.5)  # same episode, not escalated
+
+        start = clock.now
+        limiter.acquire()
+        assert clock.now - start == pytest.approx(0.5)  # waits until the pause is over
+
+        assert limiter.back_off() == 2
+        clock.now += 2
+        assert limiter.back_off() == 4
+        clock.now += 4
+        assert limiter.back_off() == 4  # the last delay is repeated
+
+        clock.now += 4
+        limiter.report_success()
+        assert limiter.back_off() == 1